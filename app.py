@@ -1,15 +1,25 @@
 import streamlit as st
 import time
 from typing import Dict, Any, List
-from crew import FraudDetectionCrew
-from crewai.tasks.task_output import TaskOutput # Correct import path
+from crew import get_crew, get_job_queue, warm_up, SEQUENTIAL_STAGES
+from utils.metrics import METRICS
+from utils.ratelimit import get_governor
+from utils.jobs import Job, QueueFull
+from utils.parsing import parse_decision
+from utils.events import EVENTS, ProgressEvent, STAGE_STARTED, STAGE_COMPLETED, STAGE_SKIPPED
 # from flowchart import AgentFlowchart # Not used with current HTML/JS approach
 import json
 # from streamlit_lottie import st_lottie # Removing Lottie for now, focusing on CSS
-import requests
 import datetime # For logging timestamps
+from collections import deque
+from functools import lru_cache
+from html import escape
+from pathlib import Path
 
 # --- Configuration ---
+MAX_LOG_ENTRIES = 500 # Ring buffer size for st.session_state.run_log
+MAX_RAW_OUTPUT_CHARS = 4000 # Raw agent output kept per log entry
+POLL_SECONDS = 0.5 # How often the page refreshes while a submitted job is pending
 AGENT_NAMES = ["Data Ingestion", "Anomaly Detection", "Risk Assessment", "Investigation", "Decision"]
 AGENT_ICONS_HTML = [ # Using Font Awesome icons (ensure internet connection or install locally)
     '<i class="fas fa-database fa-2x"></i>',
@@ -34,13 +44,17 @@ def init_session_state():
     default_description = "Sample Item"
 
     defaults = {
-        'processing': False,
+        'jobs': deque(maxlen=20), # Job ids submitted from this session
+        'active_job': None, # Job the flow and log are following
+        'job_progress': 0,
+        'finished_job': None,
         'result': None,
         'decision_shown': False,
         'agent_states': ["pending"] * len(AGENT_NAMES),
-        'current_callback_agent_index': 0,
         'dev_mode': False,
-        'run_log': [], # To store logs for recap
+        'fast_mode': False,
+        'run_log': deque(maxlen=MAX_LOG_ENTRIES), # Bounded log for recap
+        'log_seq': 0, # Sequence number of the newest log entry
         # Keys for input widgets
         'amount_input': default_amount,
         'location_input': default_location,
@@ -52,6 +66,22 @@ def init_session_state():
 
 init_session_state()
 
+def add_log(agent: str, message: str, raw_output: Any = None):
+    """Append a log entry; raw output is truncated so the ring buffer stays bounded in bytes too."""
+    st.session_state.log_seq += 1
+    entry = {
+        "seq": st.session_state.log_seq,
+        "timestamp": datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3], # HH:MM:SS.ms
+        "agent": agent,
+        "message": message
+    }
+    if raw_output is not None:
+        raw_output = str(raw_output)
+        if len(raw_output) > MAX_RAW_OUTPUT_CHARS:
+            raw_output = raw_output[:MAX_RAW_OUTPUT_CHARS] + " ...[truncated]"
+        entry["raw_output"] = raw_output
+    st.session_state.run_log.append(entry)
+
 # --- UI Setup ---
 st.set_page_config(
     page_title="Guardian Crew",
@@ -62,301 +92,62 @@ st.set_page_config(
 
 # --- Developer Mode Toggle ---
 st.session_state.dev_mode = st.sidebar.toggle("Developer Mode", value=st.session_state.dev_mode, help="Show detailed logs and raw agent outputs.")
+st.session_state.fast_mode = st.sidebar.toggle("Fast Mode", value=st.session_state.fast_mode, help="Run the whole review as a single structured LLM call instead of the agent sequence.")
 st.sidebar.markdown("---")
 st.sidebar.info("This AI system analyzes transactions using a sequence of specialized agents.")
+# The crew, its LLM clients and crewai itself load on a background thread; the page stays usable meanwhile
+backend = warm_up()
+if backend["status"] == "warming":
+    st.sidebar.caption("⏳ Warming up the agent backend...")
+elif backend["status"] == "failed":
+    st.sidebar.error(f"The agent backend failed to start: {backend.get('error')}")
+crew_stats = st.session_state.dev_mode and backend["status"] == "ready" # Don't wait on the crew lock mid warm-up
+if crew_stats and get_crew().rule_engine is not None:
+    st.sidebar.caption("Fast-path rule engine")
+    st.sidebar.json(get_crew().rule_engine.stats(), expanded=False)
+if crew_stats and get_crew().cache is not None:
+    st.sidebar.caption("Decision cache")
+    st.sidebar.json(get_crew().cache.stats(), expanded=False)
+if crew_stats and get_crew().similar is not None:
+    st.sidebar.caption("Near-duplicate cache")
+    st.sidebar.json(get_crew().similar.stats(), expanded=False)
+if crew_stats and get_crew().single_flight is not None:
+    st.sidebar.caption("In-flight coalescing")
+    st.sidebar.json(get_crew().single_flight.stats(), expanded=False)
+if crew_stats and get_crew().feature_store is not None:
+    st.sidebar.caption("Amount history (feature store)")
+    st.sidebar.json(get_crew().feature_store.stats(), expanded=False)
+if crew_stats and get_crew().velocity is not None:
+    st.sidebar.caption("Velocity counters")
+    st.sidebar.json(get_crew().velocity.stats(), expanded=False)
+if crew_stats and get_crew().cascade is not None:
+    st.sidebar.caption("Model cascade (escalations & latency)")
+    st.sidebar.json(get_crew().cascade.stats(), expanded=False)
+if crew_stats and get_crew().audit is not None:
+    st.sidebar.caption("Audit log")
+    st.sidebar.json(get_crew().audit.stats(), expanded=False)
+if st.session_state.dev_mode:
+    st.sidebar.caption("Agent backend warm-up")
+    st.sidebar.json(backend, expanded=False)
+    st.sidebar.caption("Background job queue")
+    st.sidebar.json(get_job_queue().stats(), expanded=False)
+    st.sidebar.caption("Latency & token metrics (p50/p95/p99)")
+    st.sidebar.json(METRICS.summary(), expanded=False)
+    st.sidebar.caption("Gemini quota governor")
+    st.sidebar.json(get_governor().stats(), expanded=False)
 
 # --- Custom CSS ---
-# Font Awesome CDN
-st.markdown('<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">', unsafe_allow_html=True)
-
-st.markdown("""
-<style>
-    /* --- Base & Theme --- */
-    .stApp {
-        background-color: #1a1a1a; /* Darker background */
-        color: #e0e0e0;
-    }
-    h1, h2, h3 {
-        color: #ffffff;
-    }
-    .stButton>button { /* More prominent button */
-        background-color: #e8494f;
-        color: #FFFFFF !important; /* Ensure white text */
-        padding: 14px 28px;
-        border-radius: 8px;
-        font-weight: 600;
-        border: none;
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-    }
-    .stButton>button:hover {
-        background-color: #d7373d;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 8px rgba(0,0,0,0.15);
-    }
-    .stTextInput input, .stNumberInput input {
-        background-color: #333333;
-        border: 1px solid #444444;
-        border-radius: 8px;
-        padding: 12px;
-        color: white;
-    }
-    .stTextInput input:focus, .stNumberInput input:focus {
-         border-color: #e8494f;
-         box-shadow: 0 0 0 2px rgba(232, 73, 79, 0.5);
-    }
-
-    /* --- Form & Input Area --- */
-    .form-container {
-        background-color: #262626;
-        padding: 28px;
-        border-radius: 16px;
-        margin-bottom: 30px;
-        border: 1px solid #333333;
-    }
-
-    /* --- Agent Flow Visualization --- */
-    .agent-flow {
-        display: flex;
-        flex-wrap: wrap; /* Allow nodes to wrap */
-        justify-content: center; /* Center align nodes */
-        align-items: center;
-        gap: 20px; /* Increased gap */
-        padding: 40px 20px; /* More padding */
-        margin: 30px 0;
-        background: linear-gradient(145deg, #222222, #181818); /* Subtle gradient */
-        border-radius: 16px;
-        /* overflow-x: auto; Removed, using wrap instead */
-        border: 1px solid #333333;
-    }
-
-    /* --- Agent Node --- */
-    .agent-node {
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        text-align: center;
-        padding: 25px;
-        background-color: #2d2d2d;
-        border-radius: 12px;
-        min-width: 180px; /* Slightly wider */
-        min-height: 180px; /* Taller */
-        justify-content: center; /* Center content vertically */
-        transition: all 0.4s ease-in-out;
-        position: relative; /* For tooltip */
-        border: 2px solid #444444; /* Default border */
-        box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-    }
-    .agent-node:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 8px 16px rgba(0,0,0,0.3);
-    }
-
-    /* --- Tooltip --- */
-    .agent-node .tooltiptext {
-        visibility: hidden;
-        width: 160px;
-        background-color: #555;
-        color: #fff;
-        text-align: center;
-        border-radius: 6px;
-        padding: 8px 10px;
-        position: absolute;
-        z-index: 1;
-        bottom: 115%; /* Position above the node */
-        left: 50%;
-        margin-left: -80px; /* Center the tooltip */
-        opacity: 0;
-        transition: opacity 0.3s, visibility 0.3s;
-        font-size: 12px;
-    }
-    .agent-node:hover .tooltiptext {
-        visibility: visible;
-        opacity: 1;
-    }
-    .agent-node .tooltiptext::after { /* Tooltip arrow */
-        content: "";
-        position: absolute;
-        top: 100%;
-        left: 50%;
-        margin-left: -5px;
-        border-width: 5px;
-        border-style: solid;
-        border-color: #555 transparent transparent transparent;
-    }
-
-
-    @keyframes pulse-glow {
-        0% { box-shadow: 0 0 5px #FFB800, 0 0 10px #FFB800; }
-        50% { box-shadow: 0 0 15px #FFB800, 0 0 25px #FFB800; }
-        100% { box-shadow: 0 0 5px #FFB800, 0 0 10px #FFB800; }
-    }
-
-    .agent-node.processing {
-        background-color: #3a3a3a;
-        border-color: #FFB800; /* Yellow glow for processing */
-        animation: pulse-glow 2s infinite ease-in-out;
-    }
-
-    .agent-node.completed {
-        border-color: #4CAF50; /* Green border for completed */
-        background-color: #303d30; /* Subtle green background */
-    }
-
-    .agent-icon {
-        /* font-size: 32px; - Replaced by FA size */
-        margin-bottom: 15px; /* More space */
-        color: #aaaaaa; /* Default icon color */
-        transition: color 0.3s ease;
-    }
-    .agent-node.processing .agent-icon { color: #FFB800; }
-    .agent-node.completed .agent-icon { color: #4CAF50; }
-
-    .agent-name {
-        font-size: 15px; /* Slightly larger */
-        font-weight: 600; /* Bolder */
-        margin-bottom: 10px;
-        color: #ffffff;
-    }
-
-    .agent-status {
-        font-size: 12px;
-        padding: 5px 10px;
-        border-radius: 6px;
-        background-color: #444444;
-        min-width: 80px;
-        text-align: center;
-        font-weight: 500;
-        transition: background-color 0.3s, color 0.3s;
-    }
-    .status-pending { color: #aaaaaa; background-color: #383838;}
-    .status-processing { color: #1a1a1a; background-color: #FFB800; font-weight: 700; }
-    .status-completed { color: #ffffff; background-color: #4CAF50; }
-
-    /* --- Arrow Styling --- */
-    .arrow {
-        color: #555555; /* Darker inactive arrow */
-        font-size: 28px; /* Larger arrow */
-        margin: 0 20px; /* More spacing */
-        transition: color 0.5s ease, text-shadow 0.5s ease;
-        position: relative; /* Needed for particle positioning */
-        align-self: center; /* Vertically center arrow */
-        height: 30px; /* Explicit height */
-        line-height: 30px; /* Vertically center glyph */
-    }
-
-    .arrow.active {
-        color: #4CAF50;
-        text-shadow: 0 0 12px #4CAF50, 0 0 20px #4CAF50; /* Enhanced glow */
-    }
-
-    /* Data Particle Animation */
-    @keyframes dataFlow {
-        0% { transform: translateX(-15px) scale(0.7); opacity: 0; background-color: #FFB800; } /* Start yellow */
-        20% { transform: translateX(0px) scale(1); opacity: 1; }
-        80% { transform: translateX(55px) scale(1); opacity: 1; }
-        95% { background-color: #4CAF50; } /* Transition to green */
-        100% { transform: translateX(70px) scale(0.7); opacity: 0; }
-    }
-
-    .data-particle {
-        position: absolute;
-        width: 12px; /* Larger particle */
-        height: 12px;
-        background-color: #4CAF50;
-        border-radius: 50%;
-        top: 50%;
-        left: -6px; /* Adjust start based on size */
-        transform: translateY(-50%);
-        opacity: 0;
-        box-shadow: 0 0 8px #4CAF50;
-    }
-
-    .arrow.active .data-particle {
-        animation: dataFlow 1.2s ease-in-out forwards; /* Slightly longer */
-    }
-
-    /* --- Decision Card --- */
-    .decision-card {
-        background-color: #2d2d2d;
-        border-radius: 12px;
-        padding: 25px;
-        margin-top: 30px;
-        border-left: 6px solid #555555; /* Default border */
-        transition: all 0.5s ease-in-out;
-        opacity: 0; /* Hidden by default, fade in */
-        transform: translateY(10px);
-    }
-    .decision-card.visible {
-        opacity: 1;
-        transform: translateY(0);
-    }
-    .decision-card.approved { border-left-color: #4CAF50; }
-    .decision-card.flagged { border-left-color: #FFC107; }
-    .decision-card.blocked { border-left-color: #F44336; }
-    .decision-card.error { border-left-color: #cccccc; }
-
-    .decision-title {
-        font-size: 26px;
-        font-weight: 600;
-        margin-bottom: 15px;
-        color: #ffffff;
-    }
-    .decision-explanation {
-        font-size: 16px;
-        color: #cccccc;
-        line-height: 1.6;
-    }
-    .decision-card.approved .decision-title { color: #4CAF50; }
-    .decision-card.flagged .decision-title { color: #FFC107; }
-    .decision-card.blocked .decision-title { color: #F44336; }
-    .decision-card.error .decision-title { color: #cccccc; }
-
-    /* --- Agent Insights / Log Panel --- */
-    .log-panel {
-        background-color: #262626;
-        border-radius: 12px;
-        padding: 20px;
-        margin-top: 30px;
-        border: 1px solid #333333;
-        max-height: 400px; /* Limit height */
-        overflow-y: auto; /* Enable scrolling */
-    }
-    .log-entry {
-        font-family: 'Courier New', Courier, monospace;
-        font-size: 13px;
-        margin-bottom: 8px;
-        padding-bottom: 8px;
-        border-bottom: 1px dashed #444;
-        color: #b0b0b0;
-        line-height: 1.4;
-    }
-    .log-entry:last-child {
-        border-bottom: none;
-    }
-    .log-entry strong {
-        color: #e0e0e0;
-        font-weight: 600;
-    }
-    .log-entry .timestamp {
-        color: #888888;
-        margin-right: 10px;
-        font-size: 11px;
-    }
-    .log-entry .raw-output {
-        background-color: #333;
-        padding: 5px 8px;
-        border-radius: 4px;
-        margin-top: 5px;
-        display: block;
-        white-space: pre-wrap; /* Wrap long lines */
-        word-wrap: break-word;
-        max-height: 100px; /* Limit raw output display */
-        overflow-y: auto;
-    }
-
-</style>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def page_styles() -> str:
+    # Read once per process; emitted as a single element per script run, never from callbacks
+    css = (Path(__file__).parent / "static" / "styles.css").read_text()
+    # Font Awesome CDN
+    return (
+        '<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css">'
+        f"<style>{css}</style>"
+    )
+
+st.markdown(page_styles(), unsafe_allow_html=True)
 
 # --- UI Sections ---
 
@@ -424,36 +215,38 @@ with st.container():
 # Agent Flow Display
 agent_flow_placeholder = st.empty()
 
+@lru_cache(maxsize=None)
+def agent_node_html(i: int, state: str) -> str:
+    node_class = "agent-node"
+    if state == 'processing':
+        node_class += " processing"
+    elif state == 'completed':
+        node_class += " completed"
+
+    html = f'''
+        <div class="{node_class}" id="agent-{i}">
+            <div class="agent-icon">{AGENT_ICONS_HTML[i]}</div>
+            <div class="agent-name">{AGENT_NAMES[i]}</div>
+            <div class="agent-status status-{state}" id="status-{i}">{state.capitalize()}</div>
+            <span class="tooltiptext">{AGENT_GOALS[i]}</span>
+        </div>
+    '''
+    # Render arrow if not the last node
+    if i < len(AGENT_NAMES) - 1:
+        # Arrow is active once the node before it has completed
+        arrow_class = "arrow active" if state == 'completed' else "arrow"
+        html += f'<div class="{arrow_class}" id="arrow-{i}">→<div class="data-particle"></div></div>'
+    return html
+
+_rendered_flow = [None] # States last sent to agent_flow_placeholder in this script run
+
 def render_agent_flow(states: List[str]):
+    # Node markup is memoized per (index, state); nothing is sent when the states are unchanged
+    if _rendered_flow[0] == tuple(states):
+        return
+    _rendered_flow[0] = tuple(states)
     html = '<div class="agent-flow" id="agent-flow">'
-    for i in range(len(AGENT_NAMES)):
-        node_class = "agent-node"
-        status_text = states[i].capitalize()
-        status_class = f"status-{states[i]}"
-        tooltip_text = AGENT_GOALS[i]
-        if states[i] == 'processing':
-            node_class += " processing"
-        elif states[i] == 'completed':
-            node_class += " completed"
-
-        html += f'''
-            <div class="{node_class}" id="agent-{i}">
-                <div class="agent-icon">{AGENT_ICONS_HTML[i]}</div>
-                <div class="agent-name">{AGENT_NAMES[i]}</div>
-                <div class="agent-status {status_class}" id="status-{i}">{status_text}</div>
-                <span class="tooltiptext">{tooltip_text}</span>
-            </div>
-        '''
-        # Render arrow if not the last node
-        if i < len(AGENT_NAMES) - 1:
-            arrow_class = "arrow"
-            # Arrow active state logic (simplified: active if current node is completed)
-            if states[i] == 'completed':
-                 arrow_class += " active"
-            # NOTE: The logic to start the next agent processing is now handled purely in the callback.
-            # We only control the *visual* state of the arrow here.
-            html += f'<div class="{arrow_class}" id="arrow-{i}">→<div class="data-particle"></div></div>'
-
+    html += "".join(agent_node_html(i, state) for i, state in enumerate(states))
     html += '</div>'
     agent_flow_placeholder.markdown(html, unsafe_allow_html=True)
 
@@ -513,247 +306,257 @@ if st.session_state.decision_shown:
 
 # Agent Insights / Log Panel
 log_expander = st.expander("🧠 Agent Insights & Run Log", expanded=False)
-log_placeholder = log_expander.empty()
+log_status = log_expander.empty()
+log_slot = log_expander.empty()
+log_container = [log_slot.container(height=400)]
+
+def log_entry_html(entry: Dict[str, Any]) -> str:
+    html = f'<div class="log-entry"><span class="timestamp">[{entry["timestamp"]}]</span> <strong>{entry["agent"]}</strong>: {entry["message"]}'
+    # Always show raw output if it exists and the message indicates completion
+    if entry.get("raw_output") and "completed" in entry.get("message", "").lower():
+        html += f'<div class="raw-output"><strong>Output:</strong><br>{escape(entry["raw_output"])}</div>'
+    return html + '</div>'
+
+_rendered_log_seq = [0] # Newest entry already drawn in this script run
 
 def render_log():
+    """Append only the entries not yet drawn, so a run costs O(entries) rather than O(entries^2)."""
     if not st.session_state.run_log:
-        log_placeholder.info("Submit a transaction to see agent activity.")
+        log_status.info("Submit a transaction to see agent activity.")
         return
-
-    log_html = '<div class="log-panel">'
+    log_status.empty()
     for entry in st.session_state.run_log:
-        log_html += f'<div class="log-entry"><span class="timestamp">[{entry["timestamp"]}]</span> <strong>{entry["agent"]}</strong>: {entry["message"]}'
-        # Always show raw output if it exists and the message indicates completion
-        if entry.get("raw_output") and "completed" in entry.get("message", "").lower():
-             # Basic sanitization for HTML display
-             sanitized_output = entry["raw_output"].replace('<', '&lt;').replace('>', '&gt;')
-             log_html += f'<div class="raw-output"><strong>Output:</strong><br>{sanitized_output}</div>' # Added label
-        log_html += '</div>'
-    log_html += '</div>'
-    log_placeholder.markdown(log_html, unsafe_allow_html=True)
+        if entry["seq"] > _rendered_log_seq[0]:
+            log_container[0].markdown(log_entry_html(entry), unsafe_allow_html=True)
+            _rendered_log_seq[0] = entry["seq"]
+
+def reset_log():
+    st.session_state.run_log.clear()
+    log_slot.empty()
+    log_container[0] = log_slot.container(height=400)
+    _rendered_log_seq[0] = st.session_state.log_seq
 
 # Initial log render
 render_log()
 
-# --- Callback Function ---
-def agent_callback(output: TaskOutput):
-    # --- DEBUG REMOVED ---
-    # print(f"--- Callback Received ---")
-    # print(f"Type: {type(output)}")
-    # print(f"Value: {output!r}") # Use repr for detailed view
-    # print(f"------------------------")
-    # --- END DEBUG --- 
-
-    agent_index = st.session_state.current_callback_agent_index
-    timestamp = datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3] # HH:MM:SS.ms
-
-    # Safely get raw output from TaskOutput
-    raw_data = getattr(output, 'raw_output', None) # Try standard raw_output
-    if raw_data is None:
-        raw_data = getattr(output, 'raw', None)     # Try legacy raw
-    if raw_data is None:
-        raw_data = str(output)                     # Fallback to string representation
-
-    # Log entry structure
-    log_entry = {
-        "timestamp": timestamp,
-        "agent": "Unknown",
-        "message": "Task completed.",
-        "raw_output": raw_data # Use the safely retrieved data
-    }
-
-    if 0 <= agent_index < len(AGENT_NAMES):
-        agent_name = AGENT_NAMES[agent_index]
-        log_entry["agent"] = agent_name
-        print(f"Callback: Agent '{agent_name}' (Index {agent_index}) task finished.")
-
-        try:
-            # Update current agent to completed
-            st.session_state.agent_states[agent_index] = "completed"
-            log_entry["message"] = "Task successfully completed."
-
-            # Set next agent to processing
-            next_agent_index = agent_index + 1
-            if next_agent_index < len(AGENT_NAMES):
-                 st.session_state.agent_states[next_agent_index] = "processing"
-                 st.session_state.current_callback_agent_index = next_agent_index # Increment counter
-                 st.session_state.run_log.append(log_entry) # Log completion of current
-                 # Log start of next agent
-                 st.session_state.run_log.append({
-                     "timestamp": datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                     "agent": AGENT_NAMES[next_agent_index],
-                     "message": "Starting processing..."
-                 })
-            else:
-                 # Last agent finished
-                 st.session_state.current_callback_agent_index = agent_index # Keep counter at last index
-                 st.session_state.run_log.append(log_entry) # Log completion of last agent
-
-            # Re-render UI components
-            render_agent_flow(st.session_state.agent_states)
-            render_log() # Update log panel
-
-        except IndexError:
-            print(f"Error: Agent index {agent_index} out of bounds.")
-            log_entry["message"] = "Error updating state (index out of bounds)."
-            st.session_state.run_log.append(log_entry)
-            render_log()
-        except Exception as e:
-            print(f"Error in agent_callback: {e}")
-            log_entry["message"] = f"Error during callback: {e}"
-            st.session_state.run_log.append(log_entry)
-            render_log()
+# --- Progress Events ---
+def apply_event(event: ProgressEvent):
+    """Update the flow states and log from one crew progress event (see utils/events.py)."""
+    if event.stage is None:
+        return # Run-level events are handled by sync_job
+    # Fast mode reviews every stage in one call, so its events move all nodes together
+    indices = range(len(AGENT_NAMES)) if event.stage == "fast" else [SEQUENTIAL_STAGES.index(event.stage)]
+    agent_name = "All Agents (Fast Mode)" if event.stage == "fast" else AGENT_NAMES[indices[0]]
+    if event.kind == STAGE_STARTED:
+        new_state = "processing"
+        add_log(agent_name, "Starting processing...")
+    elif event.kind == STAGE_COMPLETED:
+        new_state = "completed"
+        add_log(agent_name, "Task successfully completed.", raw_output=event.output)
+    elif event.kind == STAGE_SKIPPED:
+        new_state = "skipped"
+        add_log(agent_name, "Skipped; the risk score was decisive.")
     else:
-        print(f"Error: Invalid agent index {agent_index} in callback.")
-        log_entry["message"] = f"Callback received for invalid index {agent_index}."
-        st.session_state.run_log.append(log_entry)
-        render_log()
+        return
+    for i in indices:
+        st.session_state.agent_states[i] = new_state
 
 
 # --- Process Transaction ---
-if submitted and not st.session_state.processing:
-    st.session_state.processing = True
+def start_run(job: Job):
+    """Reset the flow and log to follow a newly submitted job."""
+    st.session_state.active_job = job.id
+    st.session_state.job_progress = 0 # Sequence number of the last progress event applied
     st.session_state.decision_shown = False
     st.session_state.result = None
-    st.session_state.current_callback_agent_index = 0 # Reset callback index
-    st.session_state.run_log = [] # Clear log for new run
-    # Reset states: first is processing, others pending
-    st.session_state.agent_states = ["processing"] + ["pending"] * (len(AGENT_NAMES) - 1)
-
-    # Initial log entry
-    st.session_state.run_log.append({
-        "timestamp": datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3],
-        "agent": AGENT_NAMES[0],
-        "message": "Starting processing..."
-    })
-
-    render_agent_flow(st.session_state.agent_states) # Initial render with first agent processing
+    reset_log() # Clear log for new run
+    # Stages move to processing as their start events arrive
+    st.session_state.agent_states = ["pending"] * len(AGENT_NAMES)
+
+    # Log the input transaction based on dev mode; the log is append-only, so this comes first
+    log_input_msg = "Received transaction."
+    if st.session_state.dev_mode:
+        log_input_msg += f" Details: {json.dumps(job.transaction)}"
+    add_log("System", log_input_msg)
+
+    render_agent_flow(st.session_state.agent_states) # Initial render with every agent pending
     render_decision(None) # Clear old decision
-    render_log() # Show initial log entry
+    render_log() # Show initial log entries
+
+
+def finish_run(job: Job):
+    """Turn the finished job's crew output into the decision card and closing log entries."""
+    if get_crew().audit is not None:
+        get_crew().audit.flush(timeout=1.0) # Make the run's audit record available for download
+    if job.status == "failed":
+        st.error(f"An error occurred during crew processing: {job.error}")
+        # Log the error
+        add_log("System", f"ERROR during processing: {job.error}")
+        st.session_state.result = {"decision": "ERROR", "explanation": job.error}
+        st.session_state.agent_states = ["completed"] * len(AGENT_NAMES) # Mark all as completed on error
+        return
+
+    crew_output = job.result # dict: {"decision": JSON_STRING, "transaction": ...}
+    if crew_output.get("rule"):
+        add_log("System", f"Decided by fast-path rule '{crew_output['rule']}'; agents were not invoked.")
+    elif crew_output.get("cached"):
+        add_log("System", "Served from the decision cache; agents were not invoked.")
+    elif crew_output.get("similar"):
+        add_log("System", f"Reused the decision for a near-duplicate transaction (similarity {crew_output['similar']['similarity']:.2f}); agents were not invoked.")
+    elif crew_output.get("coalesced"):
+        add_log("System", "An identical transaction was already being analyzed; reused its result.")
+    elif (crew_output.get("stages") or {}).get("skipped"):
+        skipped = ", ".join(crew_output["stages"]["skipped"])
+        add_log("System", f"Risk score was decisive; skipped stages: {skipped}.")
+    elif st.session_state.dev_mode:
+        add_log("System", f"Crew setup took {crew_output.get('setup_seconds', 0) * 1000:.1f} ms.")
+    if (crew_output.get("cascade") or {}).get("escalated") and not crew_output.get("coalesced"):
+        reason = {"parse": "its answer was not valid JSON", "flag": "it flagged the transaction",
+                  "uncertain": "its risk score was in the uncertainty band"}[crew_output["cascade"]["reason"]]
+        add_log("System", f"The cheaper model was escalated to the stronger one because {reason}.",
+                raw_output=crew_output["cascade"]["cheap_decision"])
+    if st.session_state.dev_mode:
+        add_log("System", f"Queued for {job.wait_seconds:.2f} s, ran for {job.run_seconds:.2f} s.")
+
+    # Extract and parse the JSON string from the crew output
+    raw_result_str = crew_output.get("decision", "{}") # Default to empty JSON
+
+    # --- Enhanced Cleaning/Extraction ---
+    final_decision_word = "ERROR"
+    final_rationale = "Error processing final decision output."
+    json_str_to_parse = None
+
+    if isinstance(raw_result_str, str):
+        # Remove potential markdown fences first
+        cleaned_str = raw_result_str.strip().strip('```')
+        # Find the first '{' and the last '}'
+        start_index = cleaned_str.find('{')
+        end_index = cleaned_str.rfind('}')
+
+        if start_index != -1 and end_index != -1 and end_index > start_index:
+            # Extract the potential JSON substring
+            json_str_to_parse = cleaned_str[start_index : end_index + 1]
+        else:
+            # Could not find valid braces, keep original cleaned string for error reporting
+            json_str_to_parse = cleaned_str 
+    else:
+         # If not a string, handle as error
+         json_str_to_parse = str(raw_result_str) # Convert non-string for error logging
+         final_rationale = f"Agent output was not a string: {raw_result_str}"
+
+    # --- Attempt Parsing ---
+    if json_str_to_parse:
+        try:
+            # Attempt to load the EXTRACTED/CLEANED JSON string
+            parsed_result = json.loads(json_str_to_parse) 
+            final_decision_word = parsed_result.get("decision", "ERROR")
+            final_rationale = parsed_result.get("rationale", "Rationale not provided by agent.")
+        except json.JSONDecodeError:
+            # Fallback if the extracted string wasn't valid JSON
+            final_rationale = f"Agent output could not be parsed as JSON after cleaning/extraction: {json_str_to_parse}"
+            # Try to extract decision from raw string as a last resort
+            if isinstance(json_str_to_parse, str):
+                decision_upper = json_str_to_parse.upper()
+                if "BLOCK" in decision_upper: final_decision_word = "Block"
+                elif "FLAG" in decision_upper: final_decision_word = "Flag"
+                elif "APPROVE" in decision_upper: final_decision_word = "Approve"
+                else: final_decision_word = "Unknown" # Could not parse decision
+        except Exception as parse_exc:
+            final_rationale = f"Error parsing final decision: {parse_exc}"
+    # If json_str_to_parse was None or empty initially, the default error values remain
+
+    # Clean up potential extra quotes or whitespace from LLM output for the decision word
+    final_decision_word = final_decision_word.strip().strip('\'"')
+
+    # Store the result for rendering
+    st.session_state.result = {
+        "decision": final_decision_word,
+        "explanation": final_rationale # Store the extracted rationale
+    }
+
+    # Rules, the caches and coalescing answer without running any stage
+    if all(state == "pending" for state in st.session_state.agent_states):
+         st.session_state.agent_states = ["skipped"] * len(AGENT_NAMES)
+
+    add_log("System", f"Processing finished. Final Result: {st.session_state.result.get('decision', 'N/A')}")
+
+
+def sync_job(job: Job):
+    """Apply progress events that arrived since the last poll, then finish the run once the job is done."""
+    # Snapshot status first so events emitted before completion are never missed
+    done = job.done
+    events = EVENTS.history(job.id, after=st.session_state.job_progress)
+    for event in events:
+        apply_event(event)
+    if events:
+        st.session_state.job_progress = events[-1].seq
+        render_agent_flow(st.session_state.agent_states)
+        render_log()
+    if done and st.session_state.finished_job != job.id:
+        st.session_state.finished_job = job.id
+        finish_run(job)
+        st.session_state.decision_shown = True
+        render_agent_flow(st.session_state.agent_states)
+        render_decision(st.session_state.result)
+        render_log() # Ensure final log is shown
 
+
+if submitted:
     transaction = {
         "amount": st.session_state.amount_input,
         "location": st.session_state.location_input,
         "description": st.session_state.description_input
     }
+    try:
+        # Runs on the process-wide worker pool; this script thread only polls
+        new_job = get_job_queue().submit(transaction, mode="fast" if st.session_state.fast_mode else "full")
+    except QueueFull:
+        st.error("The analysis queue is full. Please try again in a moment.")
+    else:
+        st.session_state.jobs.append(new_job.id)
+        start_run(new_job)
+
+active_job = get_job_queue().get(st.session_state.active_job) if st.session_state.active_job else None
+status_placeholder = st.empty()
+if active_job is not None:
+    sync_job(active_job)
+    if active_job.status == "queued" and backend["status"] == "warming":
+        status_placeholder.info("⏳ Warming up the agent backend; your transaction will start shortly...")
+    elif active_job.status == "queued":
+        status_placeholder.info(f"⏳ Queued for {active_job.wait_seconds:.1f} s ({get_job_queue().stats()['queue_depth']} waiting)...")
+    elif active_job.status == "running":
+        status_placeholder.info("🤖 AI Agents are analyzing...")
+    elif get_crew().audit is not None:
+        # The stored audit record (the job id is the run id): transaction, stage outputs, timings and decision
+        audit_record = get_crew().audit.get(active_job.id)
+        if audit_record is not None:
+            st.download_button(
+                label="⬇️ Download Audit Record",
+                data=json.dumps(audit_record, indent=2, default=str),
+                file_name=f"fraud_audit_{active_job.id}.json",
+                mime="application/json",
+                key=f"download_log_button_{active_job.id}"
+            )
 
-    # Log the input transaction based on dev mode
-    log_input_msg = "Received transaction."
-    if st.session_state.dev_mode:
-        log_input_msg += f" Details: {json.dumps(transaction)}"
-
-    st.session_state.run_log.insert(0, { # Insert at the beginning
-         "timestamp": datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3],
-         "agent": "System",
-         "message": log_input_msg
-    })
-    render_log() # Re-render log with input details
-
-    # Initialize crew with the callback
-    crew = FraudDetectionCrew(callback=agent_callback)
-
-    # Call crew.kickoff() directly
-    spinner_msg = "🤖 AI Agents are analyzing..."
-    with st.spinner(spinner_msg):
-        try:
-            # The callback handles intermediate UI updates
-            crew_output = crew.process_transaction(transaction) # Returns dict: {"decision": JSON_STRING, "transaction": ...}
-
-            # Extract and parse the JSON string from the crew output
-            raw_result_str = crew_output.get("decision", "{}") # Default to empty JSON
-
-            # --- Enhanced Cleaning/Extraction ---
-            final_decision_word = "ERROR"
-            final_rationale = "Error processing final decision output."
-            json_str_to_parse = None
-
-            if isinstance(raw_result_str, str):
-                # Remove potential markdown fences first
-                cleaned_str = raw_result_str.strip().strip('```')
-                # Find the first '{' and the last '}'
-                start_index = cleaned_str.find('{')
-                end_index = cleaned_str.rfind('}')
-                
-                if start_index != -1 and end_index != -1 and end_index > start_index:
-                    # Extract the potential JSON substring
-                    json_str_to_parse = cleaned_str[start_index : end_index + 1]
-                else:
-                    # Could not find valid braces, keep original cleaned string for error reporting
-                    json_str_to_parse = cleaned_str 
-            else:
-                 # If not a string, handle as error
-                 json_str_to_parse = str(raw_result_str) # Convert non-string for error logging
-                 final_rationale = f"Agent output was not a string: {raw_result_str}"
-
-            # --- Attempt Parsing ---
-            if json_str_to_parse:
-                try:
-                    # Attempt to load the EXTRACTED/CLEANED JSON string
-                    parsed_result = json.loads(json_str_to_parse) 
-                    final_decision_word = parsed_result.get("decision", "ERROR")
-                    final_rationale = parsed_result.get("rationale", "Rationale not provided by agent.")
-                except json.JSONDecodeError:
-                    # Fallback if the extracted string wasn't valid JSON
-                    final_rationale = f"Agent output could not be parsed as JSON after cleaning/extraction: {json_str_to_parse}"
-                    # Try to extract decision from raw string as a last resort
-                    if isinstance(json_str_to_parse, str):
-                        decision_upper = json_str_to_parse.upper()
-                        if "BLOCK" in decision_upper: final_decision_word = "Block"
-                        elif "FLAG" in decision_upper: final_decision_word = "Flag"
-                        elif "APPROVE" in decision_upper: final_decision_word = "Approve"
-                        else: final_decision_word = "Unknown" # Could not parse decision
-                except Exception as parse_exc:
-                    final_rationale = f"Error parsing final decision: {parse_exc}"
-            # If json_str_to_parse was None or empty initially, the default error values remain
-
-            # Clean up potential extra quotes or whitespace from LLM output for the decision word
-            final_decision_word = final_decision_word.strip().strip('\'"')
-
-            # Store the result for rendering
-            st.session_state.result = {
-                "decision": final_decision_word, 
-                "explanation": final_rationale # Store the extracted rationale
+# Every transaction this session submitted, newest first
+session_jobs = [job for job in (get_job_queue().get(job_id) for job_id in reversed(st.session_state.jobs)) if job is not None]
+if session_jobs:
+    with st.expander(f"📋 Submitted transactions ({len(session_jobs)})", expanded=len(session_jobs) > 1):
+        st.dataframe([
+            {
+                "Job": job.id,
+                "Amount": job.transaction.get("amount"),
+                "Location": job.transaction.get("location"),
+                "Description": job.transaction.get("description"),
+                "Status": job.status,
+                "Decision": parse_decision(job.result["decision"])["decision"] if job.status == "done" else "",
+                "Wait (s)": round(job.wait_seconds, 2),
+                "Run (s)": round(job.run_seconds, 2)
             }
-            
-            # Ensure final state is rendered correctly after kickoff finishes
-            # The callback for the *last* agent should have already set its state to 'completed'.
-            # If kickoff returns before last callback finishes (unlikely but possible), force completion.
-            if st.session_state.agent_states[-1] != "completed":
-                 st.session_state.agent_states = ["completed"] * len(AGENT_NAMES)
-
-            st.session_state.run_log.append({
-                "timestamp": datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                "agent": "System",
-                "message": f"Processing finished. Final Result: {st.session_state.result.get('decision', 'N/A')}"
-            })
-
-        except Exception as e: # Keep except block
-            st.error(f"An error occurred during crew processing: {e}")
-            # Log the error
-            st.session_state.run_log.append({
-                "timestamp": datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                "agent": "System",
-                "message": f"ERROR during processing: {e}"
-            })
-            # Optionally render an error state
-            st.session_state.result = {"decision": "ERROR", "explanation": str(e)}
-            st.session_state.agent_states = ["completed"] * len(AGENT_NAMES) # Mark all as completed on error
-        finally: # Keep finally block
-            st.session_state.processing = False
-            st.session_state.decision_shown = True
-            # Final UI updates
-            render_agent_flow(st.session_state.agent_states)
-            render_decision(st.session_state.result)
-            render_log() # Ensure final log is shown
-
-            # ADD Download Button Logic here, after final log render
-            if st.session_state.run_log: # Only show button if there's a log
-                 log_text = "\\n".join([f'[{e["timestamp"]}] {e["agent"]}: {e["message"]}' + (f'\\nRAW: {e["raw_output"]}\\n' if e.get("raw_output") else '') for e in st.session_state.run_log])
-                 st.download_button(
-                     label="⬇️ Download Log",
-                     data=log_text,
-                     file_name=f"fraud_analysis_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                     mime="text/plain",
-                     key=f"download_log_button_{st.session_state.get('run_id', 0)}" # Use a potentially unique key if needed, though placement should fix it
-                 )
-            # st.balloons() # Optional: Add some flair on completion 
\ No newline at end of file
+            for job in session_jobs
+        ], use_container_width=True, hide_index=True)
+
+# Poll while any of this session's jobs is still queued or running
+if any(not job.done for job in session_jobs):
+    time.sleep(POLL_SECONDS)
+    st.rerun()
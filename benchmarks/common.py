@@ -0,0 +1,48 @@
+import json
+import random
+import subprocess
+from typing import Dict, Any, List
+
+SAMPLE_TRANSACTIONS = [
+    {"amount": 242424.00, "location": "New York", "description": "iPhone"},
+    {"amount": 45.50, "location": "San Francisco", "description": "Coffee Shop"},
+    {"amount": 1331.00, "location": "", "description": ""},
+    {"amount": 899.99, "location": "Lagos", "description": "Electronics"},
+    {"amount": 2500.00, "location": "Unknown", "description": "Gift Card Bundle"},
+]
+
+LOCATIONS = ["New York", "San Francisco", "London", "Lagos", "Unknown", "", "Berlin", "Tokyo"]
+DESCRIPTIONS = ["Coffee Shop", "Electronics", "Luxury Watch", "Gift Card", "Groceries", "Airline Ticket", "iPhone", ""]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_transactions(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_transactions(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Distinct, reproducible transactions (no two share a cache key)."""
+    rng = random.Random(seed)
+    return [
+        {
+            "amount": round(rng.lognormvariate(4, 1.5), 2) + i / 1000,
+            "location": rng.choice(LOCATIONS),
+            "description": rng.choice(DESCRIPTIONS)
+        }
+        for i in range(count)
+    ]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
@@ -0,0 +1,63 @@
+"""Compare fast mode (one fused LLM call) against the full agent crew.
+
+Reports latency percentiles for both modes and how often they reach the same
+decision. Run from the project root:
+
+    python -m benchmarks.fast_mode [--input transactions.jsonl] [--repeat 3] [--output fast_mode.json]
+"""
+import argparse
+import json
+import time
+from typing import Dict, Any, List
+
+from benchmarks.common import SAMPLE_TRANSACTIONS, load_transactions, percentile
+from crew import FraudDetectionCrew
+from utils.parsing import parse_decision
+
+
+def run(transactions: List[Dict[str, Any]], repeat: int = 1) -> Dict[str, Any]:
+    # No rule engine or cache: every transaction must reach the LLM in both modes
+    crew = FraudDetectionCrew()
+    rows = []
+    for transaction in transactions:
+        for _ in range(repeat):
+            row = {"transaction": transaction}
+            for mode in ("full", "fast"):
+                start = time.perf_counter()
+                output = crew.process_transaction(transaction, mode=mode)
+                row[f"{mode}_seconds"] = time.perf_counter() - start
+                row[f"{mode}_decision"] = parse_decision(output["decision"])["decision"]
+            row["agree"] = row["full_decision"] == row["fast_decision"]
+            rows.append(row)
+
+    summary = {"runs": len(rows)}
+    for mode in ("full", "fast"):
+        latencies = [row[f"{mode}_seconds"] for row in rows]
+        summary[mode] = {
+            "mean_seconds": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50_seconds": percentile(latencies, 50),
+            "p95_seconds": percentile(latencies, 95),
+        }
+    summary["agreement_rate"] = sum(row["agree"] for row in rows) / len(rows) if rows else 0.0
+    if summary["fast"]["mean_seconds"]:
+        summary["speedup"] = summary["full"]["mean_seconds"] / summary["fast"]["mean_seconds"]
+    return {"summary": summary, "runs": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", help="JSONL file with one transaction per line (defaults to built-in samples)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per transaction and mode")
+    parser.add_argument("--output", help="Write the full report as JSON to this path")
+    args = parser.parse_args()
+
+    transactions = load_transactions(args.input) if args.input else SAMPLE_TRANSACTIONS
+    report = run(transactions, repeat=args.repeat)
+    print(json.dumps(report["summary"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Offline throughput, latency and overhead benchmark for FraudDetectionCrew.
+
+Swaps the Gemini client for MockChatModel (fixed latency, no network), runs
+process_batch at several concurrency levels and writes a JSON report tagged
+with the git revision, so runs can be compared across commits:
+
+    python -m benchmarks.pipeline --latency 0.2 --transactions 200 --concurrency 1 4 16 --output bench.json
+
+With ``--cascade-band 40 70`` every scenario runs cheap-model-first (the cheap
+tier answers after ``--cheap-latency``) and reports escalations and latency
+for the cheap and escalated paths.
+"""
+import argparse
+import datetime
+import json
+import time
+import tracemalloc
+from typing import Dict, Any, List
+
+import crew as crew_module
+from benchmarks.common import git_revision, load_transactions, synthetic_transactions
+from crew import Cascade, FraudDetectionCrew, ModelTier, MODES, SEQUENTIAL_STAGES, batch_summary
+from utils.compaction import ContextCompactor
+from utils.metrics import METRICS
+from utils.mock_llm import mock_factory
+
+CHEAP_MODEL = "mock-cheap"
+
+
+def stage_overhead() -> Dict[str, Any]:
+    """Per stage: mean wall time, mean time inside the LLM, and the difference (framework overhead)."""
+    report = {}
+    llm = {dict(key).get("stage"): h for key, h in METRICS.histograms("fraud_llm_seconds").items()}
+    for key, stage_hist in METRICS.histograms("fraud_stage_seconds").items():
+        stage = dict(key).get("stage")
+        if not stage_hist.count:
+            continue
+        stage_mean = stage_hist.sum / stage_hist.count
+        llm_hist = llm.get(stage)
+        llm_mean = llm_hist.sum / stage_hist.count if llm_hist else 0.0
+        report[stage] = {
+            "runs": stage_hist.count,
+            "stage_mean_seconds": stage_mean,
+            "llm_mean_seconds": llm_mean,
+            "overhead_mean_seconds": stage_mean - llm_mean,
+        }
+    return report
+
+
+def context_savings() -> Dict[str, Any]:
+    """Per stage: tokens of answer text produced vs. forwarded downstream after compaction."""
+    report = {}
+    for stage in SEQUENTIAL_STAGES:
+        raw = METRICS.counter("fraud_context_tokens_total", stage=stage, phase="raw")
+        compact = METRICS.counter("fraud_context_tokens_total", stage=stage, phase="compact")
+        if raw:
+            report[stage] = {"raw_tokens": raw, "compact_tokens": compact, "saved_share": 1 - compact / raw}
+    return report
+
+
+def run_scenario(transactions: List[Dict[str, Any]], concurrency: int, mode: str,
+                 context_budget: int = 0, cascade_band=None) -> Dict[str, Any]:
+    METRICS.reset()
+    crew = FraudDetectionCrew(
+        compactor=ContextCompactor(context_budget) if context_budget > 0 else None,
+        cascade=Cascade(ModelTier(model=CHEAP_MODEL), band=tuple(cascade_band)) if cascade_band else None
+    )
+    start = time.perf_counter()
+    results = crew.process_batch(transactions, max_concurrency=concurrency, mode=mode)
+    wall = time.perf_counter() - start
+
+    latency = METRICS.histogram("fraud_transaction_seconds", path=mode)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "transactions": len(transactions),
+        "wall_seconds": wall,
+        "throughput_per_second": len(transactions) / wall if wall else 0.0,
+        "latency_p50_seconds": latency.quantile(0.5) if latency else 0.0,
+        "latency_p99_seconds": latency.quantile(0.99) if latency else 0.0,
+        "stages": stage_overhead(),
+        "context": context_savings(),
+        "batch": batch_summary(results),
+        "cascade": crew.cascade.stats() if crew.cascade is not None else None,
+    }
+
+
+def measure_memory(transactions: List[Dict[str, Any]], mode: str, runs: int = 5) -> Dict[str, Any]:
+    """Peak traced allocation per process_transaction call, after one warm-up run."""
+    crew = FraudDetectionCrew()
+    crew.process_transaction(transactions[0], mode=mode)
+    peaks = []
+    for transaction in transactions[:runs]:
+        tracemalloc.start()
+        crew.process_transaction(transaction, mode=mode)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "runs": len(peaks),
+        "peak_bytes_mean": sum(peaks) / len(peaks) if peaks else 0,
+        "peak_bytes_max": max(peaks, default=0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per LLM call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on the simulated latency")
+    parser.add_argument("--transactions", type=int, default=50, help="Synthetic transactions per scenario")
+    parser.add_argument("--input", help="JSONL file of transactions to use instead of synthetic ones")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--mode", choices=MODES, nargs="+", default=["full"])
+    parser.add_argument("--context-budget", type=int, default=0,
+                        help="Compact each stage's answer to this many tokens before later stages see it (0 = off)")
+    parser.add_argument("--cascade-band", type=float, nargs=2, metavar=("LOW", "HIGH"),
+                        help="Run cheap-model-first, escalating on Flag, parse failures or a risk score in [LOW, HIGH]")
+    parser.add_argument("--cheap-latency", type=float, default=0.01, help="Simulated seconds per cheap-tier LLM call")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    strong, cheap = mock_factory(args.latency, args.jitter), mock_factory(args.cheap_latency, args.jitter)
+    crew_module.set_llm_factory(
+        lambda model, temperature, callbacks=None: (cheap if model == CHEAP_MODEL else strong)(model, temperature, callbacks=callbacks)
+    )
+    transactions = load_transactions(args.input) if args.input else synthetic_transactions(args.transactions)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {"latency": args.latency, "jitter": args.jitter, "transactions": len(transactions),
+                   "context_budget": args.context_budget, "cascade_band": args.cascade_band,
+                   "cheap_latency": args.cheap_latency},
+        "scenarios": [run_scenario(transactions, c, mode, args.context_budget, args.cascade_band)
+                      for mode in args.mode for c in args.concurrency],
+        "memory": {mode: measure_memory(transactions, mode) for mode in args.mode},
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Smoke check: the shared crew, the decision paths, the audit log and the HTTP service.
+
+Runs offline against the mock LLM with the audit log and feature store in a
+temporary directory, and exits non-zero if any check fails. Every check has a
+timeout, so a deadlock (e.g. in ``get_crew()``) shows up as a failure rather
+than a hang. Run from the project root:
+
+    python -m benchmarks.smoke [--timeout 60]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Dict, Any, Callable
+
+from benchmarks.common import SAMPLE_TRANSACTIONS, git_revision
+from utils.parsing import DECISIONS
+
+# Decision Maker answers and the decision the service must report for each; no
+# bundled sample reliably draws a Flag from the mock LLM, so the mid-risk case is canned
+CANNED_ANSWERS = [
+    ('{"decision": "Approve", "rationale": "Routine purchase."}', "Approve"),
+    ('{"decision": "Review", "rationale": "Amount unusual for the location."}', "Flag"),
+    ('Decision: FLAG - new device and foreign location', "Flag"),
+    ('{"decision": "Block", "rationale": "Card testing pattern."}', "Block"),
+]
+
+
+def check_shared_crew():
+    import crew
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        crews = list(executor.map(lambda _: crew.get_crew(), range(8)))
+    assert all(c is crews[0] for c in crews), "get_crew() returned different instances"
+    assert crew.get_agent_pool() is crews[0].pool, "the crew does not use the shared agent pool"
+    return {"pool": crews[0].pool.stats()}
+
+
+def check_transactions():
+    import crew
+    from utils.parsing import parse_decision
+    pipeline = crew.get_crew()
+    sources = {}
+    for transaction in SAMPLE_TRANSACTIONS:
+        result = pipeline.process_transaction(transaction)
+        decision = parse_decision(result["decision"])["decision"]
+        assert decision in DECISIONS, f"unexpected decision {decision!r} for {transaction}"
+        sources[crew.decision_source(result)] = sources.get(crew.decision_source(result), 0) + 1
+    return {"sources": sources}
+
+
+def check_batch_and_audit():
+    import crew
+    pipeline = crew.get_crew()
+    results = pipeline.process_batch(SAMPLE_TRANSACTIONS, max_concurrency=4)
+    errors = [result["error"] for result in results if result.get("error")]
+    assert not errors, f"batch errors: {errors[0]}"
+    assert pipeline.audit is not None, "the audit log is disabled"
+    pipeline.audit.flush()
+    for result in results:
+        record = pipeline.audit.get(result["run_id"])
+        assert record is not None, f"run {result['run_id']} missing from the audit log"
+    return {"results": len(results), "audit": pipeline.audit.stats()}
+
+
+def check_contract():
+    import service
+    reported = {}
+    for answer, expected in CANNED_ANSWERS:
+        response = service.to_response({"decision": answer, "transaction": SAMPLE_TRANSACTIONS[3], "rule": None})
+        assert response["decision"] == expected, f"{answer!r} reported as {response['decision']!r}, expected {expected!r}"
+        reported[expected] = reported.get(expected, 0) + 1
+    return {"decisions": reported}
+
+
+def check_similar():
+    from utils.similar import SimilarTransactionIndex
+    reused = {"amount": 999, "location": "New York", "description": "iPhone 15"}
+    # (transaction, whether it may reuse the decision for ``reused``) at the default threshold
+    cases = [
+        ({"amount": 1000, "location": "New York", "description": "iphone15 pro"}, True),
+        ({"amount": 999, "location": "New York", "description": "iPhone 16"}, False),
+        ({**reused, "card_id": "4111"}, False),
+    ]
+    similarities = {}
+    for partitioned in (True, False):
+        index = SimilarTransactionIndex(partitioned=partitioned, audit_rate=0.0)
+        index.add(reused, '{"decision": "Approve"}')
+        for transaction, expected in cases:
+            match = index.lookup(transaction)
+            assert (match is not None) == expected, f"{transaction} {'missed' if expected else 'matched'} {reused}"
+            similarities[transaction["description"]] = match["similarity"] if match else None
+    return {"similarity": similarities}
+
+
+def check_service():
+    from aiohttp.test_utils import TestClient, TestServer
+    import service
+
+    async def requests():
+        async with TestClient(TestServer(service.create_app(max_in_flight=4))) as client:
+            health = await client.get("/health")
+            assert health.status == 200, f"/health returned {health.status}"
+            score = await client.post("/score", json=SAMPLE_TRANSACTIONS[0])
+            body = await score.json()
+            assert score.status == 200 and body["decision"] in DECISIONS, f"/score returned {score.status}: {body}"
+            bad = await client.post("/score/batch", json={"transactions": [], "max_concurrency": "many"})
+            assert bad.status == 400, f"/score/batch with a bad max_concurrency returned {bad.status}"
+            return {"score": body}
+
+    return asyncio.run(requests())
+
+
+CHECKS: Dict[str, Callable[[], Dict[str, Any]]] = {
+    "shared_crew": check_shared_crew,
+    "transactions": check_transactions,
+    "batch_and_audit": check_batch_and_audit,
+    "contract": check_contract,
+    "similar": check_similar,
+    "service": check_service,
+}
+
+
+def run(timeout: float = 60.0) -> Dict[str, Any]:
+    report = {"revision": git_revision(), "checks": {}}
+    for name, check in CHECKS.items():
+        # One thread per check, abandoned on timeout: a hung check keeps its locks and would hang the next one
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"smoke-{name}")
+        start = time.perf_counter()
+        try:
+            outcome = {"ok": True, **executor.submit(check).result(timeout=timeout)}
+        except TimeoutError:
+            outcome = {"ok": False, "error": f"timed out after {timeout}s"}
+        except Exception as e:
+            outcome = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        executor.shutdown(wait=False)
+        outcome["seconds"] = round(time.perf_counter() - start, 3)
+        report["checks"][name] = outcome
+        if outcome.get("error", "").startswith("timed out"):
+            break
+    report["ok"] = len(report["checks"]) == len(CHECKS) and all(o["ok"] for o in report["checks"].values())
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds each check may take")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fraud-smoke-")
+    os.environ.setdefault("FRAUD_LLM_BACKEND", "mock")
+    os.environ["FRAUD_AUDIT_DB"] = os.path.join(workdir, "audit.db")
+    os.environ["FRAUD_FEATURE_DIR"] = os.path.join(workdir, "feature_store")
+    os.environ["FRAUD_CACHE_DB"] = ""
+
+    report = run(timeout=args.timeout)
+    print(json.dumps(report, indent=2, default=str))
+    sys.stdout.flush()
+    # A timed-out check may still hold a lock; don't wait for its thread on exit
+    os._exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
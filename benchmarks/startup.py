@@ -0,0 +1,105 @@
+"""Cold-start benchmark: module import time and time to the first decision.
+
+Every sample runs in a fresh interpreter so nothing is already imported. By
+default the crew uses the offline mock LLM (no network), so the numbers show
+import and setup cost rather than Gemini latency. Run from the project root:
+
+    python -m benchmarks.startup [--repeat 5] [--backend mock] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Any, List
+
+from benchmarks.common import SAMPLE_TRANSACTIONS, git_revision, percentile
+
+# Imported by the Streamlit app, the scoring service and the crew workers
+MODULES = ["utils.llm", "crew", "service"]
+# Loaded lazily; a module here showing up right after import is a regression
+HEAVY_MODULES = ["crewai", "langchain_core", "langchain_google_genai", "google.generativeai"]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "loaded": [m for m in json.loads(sys.argv[2]) if m in sys.modules]}))
+"""
+
+# Bypasses rules and caches so the first decision really runs the agents
+DECISION_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import crew
+imported = time.perf_counter()
+pipeline = crew.FraudDetectionCrew(mode=sys.argv[2])
+result = pipeline.process_transaction(json.loads(sys.argv[1]))
+first = time.perf_counter()
+pipeline.process_transaction(json.loads(sys.argv[1]))
+second = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "first_decision_seconds": first - start,
+    "second_decision_seconds": second - first,
+    "source": crew.decision_source(result),
+}))
+"""
+
+
+def probe(script: str, args: List[str], backend: str) -> Dict[str, Any]:
+    env = {**os.environ, "FRAUD_LLM_BACKEND": backend}
+    completed = subprocess.run([sys.executable, "-c", script, *args], capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: List[Dict[str, Any]], key: str) -> Dict[str, float]:
+    values = [sample[key] for sample in samples if key in sample]
+    return {"p50_seconds": percentile(values, 50), "max_seconds": max(values, default=0.0)}
+
+
+def run(repeat: int = 5, backend: str = "mock", mode: str = "full") -> Dict[str, Any]:
+    imports = {}
+    for module in MODULES:
+        samples = [probe(IMPORT_PROBE, [module, json.dumps(HEAVY_MODULES)], backend) for _ in range(repeat)]
+        errors = [sample["error"] for sample in samples if "error" in sample]
+        imports[module] = {
+            **summarize(samples, "seconds"),
+            "heavy_modules_loaded": sorted({name for sample in samples for name in sample.get("loaded", [])}),
+        }
+        if errors:
+            imports[module]["error"] = errors[0]
+
+    transaction = json.dumps(SAMPLE_TRANSACTIONS[1])
+    samples = [probe(DECISION_PROBE, [transaction, mode], backend) for _ in range(repeat)]
+    decision = {key: summarize(samples, key)
+                for key in ("import_seconds", "first_decision_seconds", "second_decision_seconds")}
+    decision["sources"] = sorted({sample["source"] for sample in samples if "source" in sample})
+    errors = [sample["error"] for sample in samples if "error" in sample]
+    if errors:
+        decision["error"] = errors[0]
+    return {"revision": git_revision(), "backend": backend, "mode": mode, "repeat": repeat,
+            "imports": imports, "time_to_first_decision": decision}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--backend", default="mock", help="FRAUD_LLM_BACKEND for the probes (mock, replay, gemini)")
+    parser.add_argument("--mode", default="full", help="Crew mode for the first decision (full, dag, fast)")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    report = run(repeat=args.repeat, backend=args.backend, mode=args.mode)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
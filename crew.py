@@ -1,25 +1,232 @@
-from crewai import Agent, Task, Crew
-from crewai.tasks.task_output import TaskOutput
-from typing import Dict, Any
+# crewai and the Gemini chat client are imported where first used, so importing this
+# module (and every Streamlit rerun or worker that does) stays cheap; see warm_up()
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from crewai.process import Process
+from utils.rules import RuleEngine
+from utils.cache import DecisionCache, transaction_key
+from utils.preprocess import preprocess_transaction
+from utils.pipeline import Stage, StageGraph
+from utils.parsing import parse_decision, parse_risk
+from utils.metrics import METRICS, llm_metrics_handler, stage_scope, start_http_server
+from utils.ratelimit import governed
+from utils.singleflight import SingleFlight
+from utils.compaction import ContextCompactor
+from utils.features import FeatureStore, DEFAULT_CAPACITY
+from utils.velocity import VelocityTracker
+from utils.similar import SimilarTransactionIndex
+from utils.jobs import JobQueue
+from utils.audit import AuditLog
+from utils.events import (EVENTS, EventBus, new_run_id, RUN_STARTED, STAGE_STARTED, STAGE_COMPLETED,
+                          STAGE_SKIPPED, RUN_FINISHED, RUN_FAILED)
+from dataclasses import dataclass, field
+from functools import partial
+
+if TYPE_CHECKING:
+    from crewai import Agent, Task
 
 load_dotenv()
 
-class FraudDetectionCrew:
-    def __init__(self, callback=None):
-        self.callback = callback
-        # Initialize Gemini LLM
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            google_api_key=os.getenv("GEMINI_API_KEY"),
-            temperature=0.7,
-            convert_system_message_to_human=True,
-            api_version="v1beta"
+DEFAULT_MODEL = "gemini-2.0-flash"
+DEFAULT_TEMPERATURE = 0.7
+# "local" preprocesses in Python; "llm" keeps the original Data Ingestion agent
+DEFAULT_INGESTION_MODE = os.getenv("FRAUD_INGESTION_MODE", "local")
+# "full" runs the agent pipeline in sequence; "dag" runs independent stages in parallel;
+# "fast" fuses every stage into one structured LLM call
+MODES = ("full", "dag", "fast")
+
+# Stage name -> (AgentTeam attribute, task description, expected output)
+STAGES = {
+    "ingestion": (
+        "data_ingestion_agent",
+        "Preprocess transaction data: {transaction}",
+        "Preprocessed transaction data in a structured format"
+    ),
+    "anomaly": (
+        "anomaly_detection_agent",
+        "Analyze for anomalies in the preprocessed data",
+        "List of detected anomalies and their severity"
+    ),
+    "risk": (
+        "risk_assessment_agent",
+        "Calculate risk score and provide justification based on the analysis.",
+        "A JSON object containing 'risk_score' (0-100) and 'justification' (string). Example: {'risk_score': 65, 'justification': '...'}"
+    ),
+    "investigation": (
+        "investigation_agent",
+        "Investigate transaction details for fraud indicators",
+        "Detailed investigation report with fraud indicators"
+    ),
+    "decision": (
+        "decision_agent",
+        (
+            "Review the findings from the previous agents (Data Ingestion, Anomaly Detection, Risk Assessment, Investigation). "
+            "Make the final decision (Approve, Flag, or Block) based *specifically* on the provided risk score, justification, and investigation report. "
+            "Provide a clear, concise rationale that **summarizes the key reasons** for the decision, referencing the critical findings from the Risk Assessment and Investigation stages. "
+            "Output ONLY a JSON object containing the 'decision' word and the final 'rationale' incorporating these key findings."
+        ),
+        (
+            "A JSON object with keys 'decision' (string: 'Approve', 'Flag', or 'Block') and 'rationale' (string). "
+            "Example: {\"decision\": \"Flag\", \"rationale\": \"Flagged due to high risk score (75) indicating unusual amount for location, as noted by Risk Assessment. Investigation confirmed lack of user history for such purchases.\"}"
+        )
+    ),
+}
+SEQUENTIAL_STAGES = ["ingestion", "anomaly", "risk", "investigation", "decision"]
+# Inputs each stage consumes in "full" mode: the outputs of every earlier stage
+SEQUENTIAL_INPUTS = {name: tuple(SEQUENTIAL_STAGES[:i]) for i, name in enumerate(SEQUENTIAL_STAGES)}
+STAGE_TITLES = {
+    "ingestion": "Data Ingestion",
+    "anomaly": "Anomaly Detection",
+    "risk": "Risk Assessment",
+    "investigation": "Investigation",
+    "decision": "Decision"
+}
+# Inputs each stage consumes in "dag" mode. Anomaly detection and investigation only
+# need the preprocessed transaction, so they run side by side. Risk and the decision
+# see the same outputs as in "full" mode, including the transaction from ingestion.
+DAG_INPUTS = {
+    "ingestion": (),
+    "anomaly": ("ingestion",),
+    "investigation": ("ingestion",),
+    "risk": ("ingestion", "anomaly"),
+    "decision": ("ingestion", "anomaly", "risk", "investigation"),
+}
+
+
+@dataclass
+class RiskGate:
+    """Decide straight from the Risk Analyst's score when it is clearly low or clearly high."""
+    approve_below: float = 20.0
+    block_at_or_above: float = 90.0
+
+    def check(self, risk_output: Any) -> Optional[str]:
+        risk = parse_risk(risk_output)
+        if risk is None:
+            return None
+        score = risk["risk_score"]
+        if score < self.approve_below:
+            decision = "Approve"
+            reason = f"Risk score {score:g} is below the auto-approve threshold ({self.approve_below:g})"
+        elif score >= self.block_at_or_above:
+            decision = "Block"
+            reason = f"Risk score {score:g} is at or above the auto-block threshold ({self.block_at_or_above:g})"
+        else:
+            return None
+        rationale = f"{reason}; investigation and final review were skipped. Risk Assessment: {risk['justification']}"
+        return json.dumps({"decision": decision, "rationale": rationale})
+
+
+def gemini_llm(model: str, temperature: float, callbacks=None):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=os.getenv("GEMINI_API_KEY"),
+        temperature=temperature,
+        convert_system_message_to_human=True,
+        api_version="v1beta",
+        callbacks=callbacks,
+        # Retries are scheduled by the shared quota governor (utils/ratelimit.py)
+        max_retries=1
+    )
+
+
+def default_llm_factory():
+    """Pick the chat client builder from FRAUD_LLM_BACKEND: gemini (default), mock, record or replay."""
+    backend = os.getenv("FRAUD_LLM_BACKEND", "gemini")
+    if backend == "mock":
+        from utils.mock_llm import mock_factory
+        return mock_factory(float(os.getenv("FRAUD_MOCK_LATENCY", "0")))
+    if backend in ("record", "replay"):
+        from utils.cassette import cassette_factory
+        return cassette_factory(
+            os.getenv("FRAUD_CASSETTE_PATH", "llm_cassette.db"),
+            backend,
+            inner_factory=governed(gemini_llm) if backend == "record" else None,
+            latency=float(os.getenv("FRAUD_CASSETTE_LATENCY", "0"))
+        )
+    return governed(gemini_llm)
+
+
+# Chat clients are shared process-wide so every crew reuses the same HTTP session
+_llm_lock = threading.Lock()
+_llm_clients: Dict[tuple, Any] = {}
+_llm_factory = None  # Resolved from FRAUD_LLM_BACKEND on first use
+
+def get_llm(model: str = DEFAULT_MODEL, temperature: float = DEFAULT_TEMPERATURE):
+    """Return the shared chat client for this model configuration."""
+    global _llm_factory
+    key = (model, temperature)
+    with _llm_lock:
+        if _llm_factory is None:
+            _llm_factory = default_llm_factory()
+        client = _llm_clients.get(key)
+        if client is None:
+            client = _llm_clients[key] = _llm_factory(model, temperature, callbacks=[llm_metrics_handler()])
+        return client
+
+def set_llm_factory(factory=None):
+    """Change how chat clients are built, e.g. to the offline mock used by the benchmarks.
+
+    ``factory(model, temperature, callbacks=...)`` must return a LangChain chat model;
+    None restores the FRAUD_LLM_BACKEND default. Cached clients, pooled agent teams and the shared crew are
+    dropped so that crews created afterwards use the new clients.
+    """
+    global _llm_factory, _agent_pool, _default_crew
+    with _llm_lock:
+        _llm_factory = factory
+        _llm_clients.clear()
+    with _pool_lock:
+        _agent_pool = None
+        _default_crew = None
+
+
+def parse_agent_models(spec: str) -> Dict[str, str]:
+    """Read per-agent overrides written as ``"risk=gemini-2.5-pro,decision=gemini-2.5-pro"``."""
+    models = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        stage, _, model = item.partition("=")
+        stage, model = stage.strip(), model.strip()
+        if stage not in STAGES and stage != "fast":
+            raise ValueError(f"Unknown agent stage in model spec: {stage}")
+        if not model:
+            raise ValueError(f"Missing model for agent stage: {stage}")
+        models[stage] = model
+    return models
+
+
+@dataclass
+class ModelTier:
+    """Which chat model each agent runs on: ``model`` unless ``stage_models`` names another for its stage."""
+    model: str = DEFAULT_MODEL
+    temperature: float = DEFAULT_TEMPERATURE
+    stage_models: Dict[str, str] = field(default_factory=dict)
+
+    def model_for(self, stage: str) -> str:
+        return self.stage_models.get(stage, self.model)
+
+    @classmethod
+    def from_env(cls, model_var: str, stages_var: str, default_model: str = DEFAULT_MODEL) -> "ModelTier":
+        return cls(
+            model=os.getenv(model_var) or default_model,
+            stage_models=parse_agent_models(os.getenv(stages_var, ""))
         )
 
+
+class AgentTeam:
+    """The five crew agents, built once on the shared LLM clients and reused across runs."""
+
+    def __init__(self, llm=None, models: Optional[ModelTier] = None):
+        from crewai import Agent
+        models = models or ModelTier()
+        # An explicit client overrides the per-agent models
+        def client(stage: str):
+            return llm or get_llm(models.model_for(stage), models.temperature)
+
         # Initialize agents using CrewAI's native implementation with Gemini
         self.data_ingestion_agent = Agent(
             role="Data Preprocessor",
@@ -27,7 +234,7 @@ class FraudDetectionCrew:
             backstory="Expert in data normalization and feature extraction",
             verbose=True,
             allow_delegation=False,
-            llm=llm,
+            llm=client("ingestion"),
             max_iterations=1
         )
 
@@ -37,7 +244,7 @@ class FraudDetectionCrew:
             backstory="Specialized in pattern recognition and outlier detection",
             verbose=True,
             allow_delegation=False,
-            llm=llm,
+            llm=client("anomaly"),
             max_iterations=1
         )
 
@@ -47,7 +254,7 @@ class FraudDetectionCrew:
             backstory="Experienced in risk modeling and fraud prevention",
             verbose=True,
             allow_delegation=False,
-            llm=llm,
+            llm=client("risk"),
             max_iterations=1
         )
 
@@ -57,7 +264,7 @@ class FraudDetectionCrew:
             backstory="Former financial crime investigator with deep domain knowledge",
             verbose=True,
             allow_delegation=False,
-            llm=llm,
+            llm=client("investigation"),
             max_iterations=1
         )
 
@@ -67,55 +274,24 @@ class FraudDetectionCrew:
             backstory="Senior fraud analyst with authority to approve or block transactions",
             verbose=True,
             allow_delegation=False,
-            llm=llm,
+            llm=client("decision"),
             max_iterations=1
         )
 
-    def create_tasks(self, transaction: Dict[str, Any]) -> list[Task]:
-        return [
-            Task(
-                description=f"Preprocess transaction data: {transaction}",
-                agent=self.data_ingestion_agent,
-                expected_output="Preprocessed transaction data in a structured format",
-                callback=self.callback
-            ),
-            Task(
-                description="Analyze for anomalies in the preprocessed data",
-                agent=self.anomaly_detection_agent,
-                expected_output="List of detected anomalies and their severity",
-                callback=self.callback
-            ),
-            Task(
-                description="Calculate risk score and provide justification based on the analysis.",
-                agent=self.risk_assessment_agent,
-                expected_output="A JSON object containing 'risk_score' (0-100) and 'justification' (string). Example: {'risk_score': 65, 'justification': '...'}",
-                callback=self.callback
-            ),
-            Task(
-                description="Investigate transaction details for fraud indicators",
-                agent=self.investigation_agent,
-                expected_output="Detailed investigation report with fraud indicators",
-                callback=self.callback
-            ),
-            Task(
-                description=(
-                    "Review the findings from the previous agents (Data Ingestion, Anomaly Detection, Risk Assessment, Investigation). "
-                    "Make the final decision (Approve, Flag, or Block) based *specifically* on the provided risk score, justification, and investigation report. "
-                    "Provide a clear, concise rationale that **summarizes the key reasons** for the decision, referencing the critical findings from the Risk Assessment and Investigation stages. "
-                    "Output ONLY a JSON object containing the 'decision' word and the final 'rationale' incorporating these key findings."
-                ),
-                agent=self.decision_agent,
-                expected_output=(
-                    "A JSON object with keys 'decision' (string: 'Approve', 'Flag', or 'Block') and 'rationale' (string). "
-                    "Example: {\"decision\": \"Flag\", \"rationale\": \"Flagged due to high risk score (75) indicating unusual amount for location, as noted by Risk Assessment. Investigation confirmed lack of user history for such purchases.\"}"
-                ),
-                callback=self.callback
-            )
-        ]
+        # Single-call agent used by fast mode
+        self.fast_agent = Agent(
+            role="Fraud Analyst",
+            goal="Perform a complete fraud review of a transaction in a single pass",
+            backstory="Senior analyst combining anomaly detection, risk scoring and investigation expertise",
+            verbose=True,
+            allow_delegation=False,
+            llm=client("fast"),
+            max_iterations=1
+        )
 
-    def process_transaction(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
-        all_tasks = self.create_tasks(transaction)
-        all_agents = [
+    @property
+    def agents(self) -> List["Agent"]:
+        return [
             self.data_ingestion_agent,
             self.anomaly_detection_agent,
             self.risk_assessment_agent,
@@ -123,18 +299,700 @@ class FraudDetectionCrew:
             self.decision_agent
         ]
 
-        crew = Crew(
-            agents=all_agents,
-            tasks=all_tasks,
-            verbose=True,
-            process=Process.sequential
+
+class AgentPool:
+    """Thread-safe pool of warm AgentTeams.
+
+    CrewAI binds agents to the crew that is currently running them, so a team is
+    checked out for the duration of one kickoff. Teams are built lazily, up to
+    ``max_size``; callers beyond that wait for one to be returned.
+    """
+
+    def __init__(self, max_size: int = 32, factory=AgentTeam):
+        self.max_size = max_size
+        self._factory = factory
+        self._idle: List[AgentTeam] = []
+        self._created = 0
+        self._cond = threading.Condition()
+        self.build_seconds = 0.0  # Total time spent constructing teams
+
+    @contextmanager
+    def acquire(self):
+        team = self._checkout()
+        try:
+            yield team
+        finally:
+            with self._cond:
+                self._idle.append(team)
+                self._cond.notify()
+
+    def _checkout(self) -> AgentTeam:
+        with self._cond:
+            while not self._idle and self._created >= self.max_size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        start = time.perf_counter()
+        try:
+            team = self._factory()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.build_seconds += time.perf_counter() - start
+        return team
+
+    def prewarm(self, count: int = 1):
+        """Build up to ``count`` idle teams now, so the first runs skip the crewai import and setup."""
+        with self._cond:
+            missing = min(count, self.max_size) - self._created
+        teams = [self._checkout() for _ in range(max(0, missing))]
+        with self._cond:
+            self._idle.extend(teams)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "teams_built": self._created,
+                "teams_idle": len(self._idle),
+                "build_seconds": self.build_seconds
+            }
+
+
+class Cascade:
+    """Cheap-model-first routing: decide on a cheaper model tier and escalate only when unsure.
+
+    A transaction first runs on agents from ``cheap``. It is re-run on the
+    crew's regular (stronger) pool when the cheap decision is Flag and
+    ``escalate_on_flag`` is set, when the cheap Risk Analyst score lies inside
+    ``band`` (inclusive), or when the decision is not valid JSON.
+    """
+
+    REASONS = ("parse", "flag", "uncertain")
+
+    def __init__(self, cheap: ModelTier, band: Tuple[float, float] = (40.0, 70.0), escalate_on_flag: bool = True,
+                 pool_size: int = 32):
+        self.cheap = cheap
+        self.band = band
+        self.escalate_on_flag = escalate_on_flag
+        self.pool = AgentPool(max_size=pool_size, factory=partial(AgentTeam, models=cheap))
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "escalated": 0, **{reason: 0 for reason in self.REASONS}}
+
+    def escalation_reason(self, result: Dict[str, Any]) -> Optional[str]:
+        """Why the cheap tier's result needs the strong tier, or None to keep it."""
+        decision = parse_decision(result["decision"])
+        if not decision["parsed"]:
+            return "parse"
+        if self.escalate_on_flag and decision["decision"] == "Flag":
+            return "flag"
+        # Full and DAG runs keep the Risk Analyst's answer; fast mode's JSON carries risk_score itself
+        outputs = (result.get("stages") or {}).get("outputs") or {}
+        risk = parse_risk(outputs.get("risk", result["decision"]))
+        if risk is not None and self.band[0] <= risk["risk_score"] <= self.band[1]:
+            return "uncertain"
+        return None
+
+    def record(self, seconds: float, reason: Optional[str]):
+        METRICS.observe("fraud_cascade_seconds", seconds, path="escalated" if reason else "cheap")
+        if reason:
+            METRICS.inc("fraud_cascade_escalations_total", reason=reason)
+        with self._lock:
+            self._stats["runs"] += 1
+            if reason:
+                self._stats["escalated"] += 1
+                self._stats[reason] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["escalation_rate"] = stats["escalated"] / stats["runs"] if stats["runs"] else 0.0
+        for path in ("cheap", "escalated"):
+            latency = METRICS.histogram("fraud_cascade_seconds", path=path)
+            stats[f"{path}_seconds"] = {
+                f"p{q}": latency.quantile(q / 100) if latency else 0.0 for q in (50, 95, 99)
+            }
+        return stats
+
+
+_pool_lock = threading.RLock()  # get_crew() builds the agent pool while holding it
+_agent_pool: Optional[AgentPool] = None
+_default_crew = None
+_job_queue: Optional[JobQueue] = None
+_warm_state: Dict[str, Any] = {"status": "cold"}
+
+def get_agent_pool() -> AgentPool:
+    global _agent_pool
+    with _pool_lock:
+        if _agent_pool is None:
+            _agent_pool = AgentPool(
+                max_size=int(os.getenv("FRAUD_CREW_POOL_SIZE", "32")),
+                factory=partial(AgentTeam, models=ModelTier.from_env("FRAUD_MODEL", "FRAUD_AGENT_MODELS"))
+            )
+        return _agent_pool
+
+def get_crew() -> "FraudDetectionCrew":
+    """Process-wide FraudDetectionCrew shared by the UI and any other entry point."""
+    global _default_crew
+    with _pool_lock:
+        if _default_crew is None:
+            cache = DecisionCache(
+                max_entries=int(os.getenv("FRAUD_CACHE_SIZE", "10000")),
+                ttl_seconds=float(os.getenv("FRAUD_CACHE_TTL", "3600")),
+                db_path=os.getenv("FRAUD_CACHE_DB") or None
+            )
+            budget = int(os.getenv("FRAUD_CONTEXT_BUDGET", "150"))
+            audit_path = os.getenv("FRAUD_AUDIT_DB", "audit.db")
+            threshold = float(os.getenv("FRAUD_SIMILAR_THRESHOLD", "0.86"))
+            similar = SimilarTransactionIndex(
+                threshold=threshold,
+                max_entries=int(os.getenv("FRAUD_SIMILAR_SIZE", "20000")),
+                audit_rate=float(os.getenv("FRAUD_SIMILAR_AUDIT", "0.05"))
+            ) if threshold > 0 else None
+            _default_crew = FraudDetectionCrew(
+                rule_engine=RuleEngine(), cache=cache, risk_gate=RiskGate(), single_flight=SingleFlight(),
+                compactor=ContextCompactor(budget) if budget > 0 else None,
+                feature_store=FeatureStore(
+                    capacity=int(os.getenv("FRAUD_FEATURE_CAPACITY", str(DEFAULT_CAPACITY))),
+                    path=os.getenv("FRAUD_FEATURE_DIR") or None
+                ),
+                velocity=VelocityTracker(
+                    shards=int(os.getenv("FRAUD_VELOCITY_SHARDS", "16")),
+                    review_limits={
+                        "1m": int(os.getenv("FRAUD_VELOCITY_REVIEW_1M", "3")),
+                        "1h": int(os.getenv("FRAUD_VELOCITY_REVIEW_1H", "20"))
+                    }
+                ),
+                similar=similar,
+                audit=AuditLog(path=audit_path) if audit_path else None,
+                cascade=default_cascade()
+            )
+            if os.getenv("FRAUD_METRICS_PORT"):
+                start_http_server(int(os.getenv("FRAUD_METRICS_PORT")))
+        return _default_crew
+
+
+def default_cascade() -> Optional[Cascade]:
+    """Cascade configured from FRAUD_CASCADE_*; None unless FRAUD_CASCADE_MODEL names the cheap model."""
+    if not os.getenv("FRAUD_CASCADE_MODEL"):
+        return None
+    low, high = (float(bound) for bound in os.getenv("FRAUD_CASCADE_BAND", "40,70").split(","))
+    return Cascade(
+        ModelTier.from_env("FRAUD_CASCADE_MODEL", "FRAUD_CASCADE_AGENT_MODELS"),
+        band=(low, high),
+        escalate_on_flag=os.getenv("FRAUD_CASCADE_ON_FLAG", "1") != "0",
+        pool_size=int(os.getenv("FRAUD_CREW_POOL_SIZE", "32"))
+    )
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide background queue running transactions through the shared crew."""
+    global _job_queue
+    with _pool_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                # The job id doubles as the run id, so pollers follow the job on the event bus
+                lambda job: get_crew().process_transaction(job.transaction, mode=job.mode, run_id=job.id),
+                workers=int(os.getenv("FRAUD_JOB_WORKERS", "4")),
+                max_queue=int(os.getenv("FRAUD_JOB_QUEUE_SIZE", "1000"))
+            )
+        return _job_queue
+
+
+def warm_up(teams: int = 1) -> Dict[str, Any]:
+    """Build the shared crew, job queue and ``teams`` agent teams on a daemon thread.
+
+    Returns the warm-up state immediately (``status``: cold, warming, ready or
+    failed, plus ``seconds`` once finished); only the first call starts the thread,
+    so callers may invoke it on every request or rerun to poll.
+    """
+    with _pool_lock:
+        if _warm_state["status"] == "cold":
+            _warm_state["status"] = "warming"
+            threading.Thread(target=_warm, args=(teams,), name="crew-warmup", daemon=True).start()
+        return dict(_warm_state)
+
+def _warm(teams: int):
+    start = time.perf_counter()
+    try:
+        get_job_queue()
+        crew = get_crew()
+        crew.pool.prewarm(teams)
+        if crew.cascade is not None:
+            crew.cascade.pool.prewarm(teams)
+        state = {"status": "ready"}
+    except Exception as e:
+        state = {"status": "failed", "error": str(e)}
+    _warm_state.update(state, seconds=round(time.perf_counter() - start, 3))
+
+
+class FraudDetectionCrew:
+    def __init__(self, callback=None, pool: Optional[AgentPool] = None, rule_engine: Optional[RuleEngine] = None,
+                 cache: Optional[DecisionCache] = None, ingestion_mode: str = DEFAULT_INGESTION_MODE,
+                 mode: str = "full", risk_gate: Optional[RiskGate] = None,
+                 single_flight: Optional[SingleFlight] = None, compactor: Optional[ContextCompactor] = None,
+                 feature_store: Optional[FeatureStore] = None, velocity: Optional[VelocityTracker] = None,
+                 similar: Optional[SimilarTransactionIndex] = None, events: Optional[EventBus] = None,
+                 audit: Optional[AuditLog] = None, cascade: Optional[Cascade] = None):
+        if ingestion_mode not in ("local", "llm"):
+            raise ValueError(f"Unknown ingestion mode: {ingestion_mode}")
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.callback = callback
+        self.ingestion_mode = ingestion_mode
+        self.mode = mode
+        self.pool = pool or get_agent_pool()
+        # Optional deterministic fast path; only ambiguous transactions reach the agents
+        self.rule_engine = rule_engine
+        # Optional cache of crew decisions keyed on the canonical transaction
+        self.cache = cache
+        # Optional early exit once the risk score is known
+        self.risk_gate = risk_gate
+        # Optional coalescing of identical transactions that are already being decided
+        self.single_flight = single_flight
+        # Optional compaction of each stage's answer before downstream agents see it
+        self.compactor = compactor
+        # Optional amount history per location and description, shown to the Anomaly Detector
+        self.feature_store = feature_store
+        # Optional sliding-window counts and sums, shown to the Risk Analyst
+        self.velocity = velocity
+        # Optional reuse of a prior crew decision for a near-duplicate transaction
+        self.similar = similar
+        # Progress events per run, for the UI and any other subscriber
+        self.events = events or EVENTS
+        # Optional durable record of every decided run
+        self.audit = audit
+        # Optional cheap-model-first run, escalated to ``pool`` when unsure
+        self.cascade = cascade
+
+    def create_task(self, stage: str, team: AgentTeam, callback=None, description: Optional[str] = None) -> "Task":
+        from crewai import Task
+        agent_attr, default_description, expected_output = STAGES[stage]
+        return Task(
+            description=description or default_description,
+            agent=getattr(team, agent_attr),
+            expected_output=expected_output,
+            callback=callback or self.callback
         )
-        
-        result = crew.kickoff()
+
+    def build_graph(self, transaction: Dict[str, Any], team: AgentTeam, callback=None,
+                    layout: Dict[str, tuple] = SEQUENTIAL_INPUTS,
+                    context_stats: Optional[Dict[str, Dict[str, int]]] = None,
+                    run_id: Optional[str] = None) -> StageGraph:
+        """Stage graph for one transaction; each stage sees only the outputs of its declared inputs.
+
+        ``SEQUENTIAL_INPUTS`` reproduces the original agent sequence ("full" mode),
+        ``DAG_INPUTS`` lets independent stages run side by side ("dag" mode).
+        With a compactor, downstream stages see each answer's compact summary while
+        the graph keeps the raw answers; per-stage token counts land in ``context_stats``.
+        With ``run_id``, each stage reports its start and completion on the event bus.
+        """
+        compacted: Dict[str, str] = {}
+        history = self._history_context(transaction)
+        velocity = self._velocity_context(transaction)
+
+        def compacting(stage: str, run):
+            if self.compactor is None or stage == "decision":
+                return run
+
+            def wrapped(inputs: Dict[str, Any]) -> str:
+                output = run(inputs)
+                compact = self.compactor.compact(stage, output)
+                counts = self.compactor.record(stage, output, compact)
+                if counts["compact_tokens"] < counts["raw_tokens"]:
+                    compacted[stage] = compact
+                if context_stats is not None:
+                    context_stats[stage] = counts
+                return output
+            return wrapped
+
+        def reporting(stage: str, run):
+            if run_id is None:
+                return run
+
+            def wrapped(inputs: Dict[str, Any]) -> str:
+                self.events.emit(run_id, STAGE_STARTED, stage)
+                output = run(inputs)
+                self.events.emit(run_id, STAGE_COMPLETED, stage, output=output)
+                return output
+            return wrapped
+
+        def ingest(inputs: Dict[str, Any]) -> str:
+            if self.ingestion_mode == "llm":
+                return self._run_stage("ingestion", team, callback, STAGES["ingestion"][1].format(transaction=transaction))
+            # Data Ingestion runs locally; hand its structured output straight to the downstream agents
+            return json.dumps(preprocess_transaction(transaction), default=str)
+
+        def agent_stage(stage: str):
+            def run(inputs: Dict[str, Any]) -> str:
+                context = "\n\n".join(
+                    f"[{STAGE_TITLES[name]} output]\n{compacted.get(name, output)}" for name, output in inputs.items()
+                )
+                description = f"{STAGES[stage][1]}\n\nFindings from upstream stages:\n{context}"
+                if stage == "anomaly" and history:
+                    description += f"\n\n{history}"
+                if stage == "risk" and velocity:
+                    description += f"\n\n{velocity}"
+                return self._run_stage(stage, team, callback, description)
+            return run
+
+        return StageGraph([
+            Stage(name, layout[name], reporting(name, compacting(name, ingest if name == "ingestion" else agent_stage(name))))
+            for name in layout
+        ])
+
+    def _history_context(self, transaction: Dict[str, Any]) -> str:
+        if self.feature_store is None:
+            return ""
+        features = {dimension: f for dimension, f in self.feature_store.features(transaction).items() if f}
+        if not features:
+            return ""
+        return (
+            "Historical amount profile for this location and description (count, mean, std, p50/p95 of past amounts, "
+            "and this amount's z_score and percentile against them):\n" + json.dumps(features)
+        )
+
+    def _velocity_context(self, transaction: Dict[str, Any]) -> str:
+        if self.velocity is None:
+            return ""
+        features = self.velocity.features(transaction)
+        if not features:
+            return ""
+        return (
+            "Recent velocity for this location, description and card/account (transaction count and amount sum "
+            "over the last 1m/1h/24h, including this one; bursts of small amounts suggest card testing):\n"
+            + json.dumps(features)
+        )
+
+    def _observe(self, transaction: Dict[str, Any], result: Dict[str, Any]):
+        """Fold a scored transaction into the running history; coalesced duplicates are counted once."""
+        if result.get("coalesced") or result.get("error"):
+            return
+        if self.feature_store is not None:
+            self.feature_store.update(transaction)
+
+    def _run_stage(self, stage: str, team: AgentTeam, callback, description: str) -> str:
+        from crewai import Crew, Process
+        task = self.create_task(stage, team, callback, description)
+        crew = Crew(agents=[task.agent], tasks=[task], verbose=True, process=Process.sequential)
+        with stage_scope(stage):
+            return str(crew.kickoff())
+
+    def create_fast_task(self, transaction: Dict[str, Any], team: AgentTeam, callback=None) -> "Task":
+        from crewai import Task
+        preprocessed = json.dumps(preprocess_transaction(transaction), default=str)
+        history = self._history_context(transaction)
+        velocity = self._velocity_context(transaction)
+        return Task(
+            description=(
+                f"Perform a complete fraud review of this preprocessed transaction: {preprocessed}. "
+                "In one pass: (1) list any anomalies and their severity, (2) calculate a risk score from 0 to 100 with justification, "
+                "(3) investigate the details for fraud indicators, and (4) make the final decision (Approve, Flag, or Block) "
+                "based specifically on that risk score and those indicators. "
+                "Output ONLY a JSON object with the keys 'anomalies' (list of strings), 'risk_score' (integer 0-100), "
+                "'investigation' (string), 'decision' and 'rationale' (a concise summary of the key reasons for the decision)."
+                + (f"\n\n{history}" if history else "")
+                + (f"\n\n{velocity}" if velocity else "")
+            ),
+            agent=team.fast_agent,
+            expected_output=(
+                "A JSON object with keys 'anomalies', 'risk_score', 'investigation', 'decision' (string: 'Approve', 'Flag', or 'Block') and 'rationale' (string). "
+                "Example: {\"anomalies\": [\"Amount far above typical for location\"], \"risk_score\": 75, \"investigation\": \"No purchase history for this category.\", "
+                "\"decision\": \"Flag\", \"rationale\": \"Flagged due to high risk score (75) driven by an unusual amount for the location.\"}"
+            ),
+            callback=callback or self.callback
+        )
+
+    def process_transaction(self, transaction: Dict[str, Any], callback=None, mode: Optional[str] = None,
+                            run_id: Optional[str] = None) -> Dict[str, Any]:
+        """Decide one transaction, reporting progress on the event bus under ``run_id`` (generated when omitted)."""
+        mode = mode or self.mode
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        run_id = run_id or new_run_id()
+        start = time.perf_counter()
+        self.events.open_run(run_id)
+        self.events.emit(run_id, RUN_STARTED, mode=mode)
+        try:
+            # Velocity counts arrivals, so concurrent bursts see each other
+            if self.velocity is not None:
+                self.velocity.record(transaction)
+            # A card/account burst gets a full review: no rule approval, no replayed decision
+            review = self.velocity.needs_review(transaction) if self.velocity is not None else None
+            result = None
+            if self.rule_engine is not None:
+                rule_start = time.perf_counter()
+                verdict = self.rule_engine.evaluate(transaction)
+                if verdict is not None and not (review and verdict.decision == "Approve"):
+                    METRICS.observe("fraud_transaction_seconds", time.perf_counter() - rule_start, path="rule")
+                    result = self._rule_result(transaction, verdict)
+            if result is None:
+                result = self._decide_once(transaction, callback, mode, run_id, reuse=review is None)
+                if review:
+                    result = {**result, "velocity_review": review}
+        except Exception as e:
+            self.events.emit(run_id, RUN_FAILED, error=str(e))
+            self._audit({"decision": None, "transaction": transaction, "mode": mode, "error": str(e), "run_id": run_id},
+                        time.perf_counter() - start)
+            raise
+        result = {**result, "run_id": run_id}
+        self._observe(transaction, result)
+        self._audit(result, time.perf_counter() - start)
+        self.events.emit(run_id, RUN_FINISHED, output=result["decision"], source=decision_source(result))
+        return result
+
+    def _audit(self, result: Dict[str, Any], seconds: Optional[float] = None):
+        if self.audit is not None:
+            self.audit.record(result, decision_source(result), seconds)
+
+    def _rule_result(self, transaction: Dict[str, Any], verdict) -> Dict[str, Any]:
+        return {
+            "decision": verdict.to_output(),
+            "transaction": transaction,
+            "rule": verdict.rule,
+            "cached": False,
+            "setup_seconds": 0.0
+        }
+
+    def _decide_once(self, transaction: Dict[str, Any], callback=None, mode: str = "full",
+                     run_id: Optional[str] = None, reuse: bool = True) -> Dict[str, Any]:
+        """``_decide``, sharing one run between concurrent callers with the same transaction and mode.
+
+        Followers get a copy of the leader's result marked ``coalesced``; their
+        callback is not invoked and their run emits no stage events because the
+        stages ran on the leader's behalf.
+        """
+        if self.single_flight is None:
+            return self._decide(transaction, callback, mode, run_id, reuse)
+        key = (transaction_key(transaction), mode, reuse)
+        result, shared = self.single_flight.do(key, lambda: self._decide(transaction, callback, mode, run_id, reuse))
+        if not shared:
+            return result
+        return {**result, "transaction": transaction, "coalesced": True}
+
+    def _decide(self, transaction: Dict[str, Any], callback=None, mode: str = "full",
+                run_id: Optional[str] = None, reuse: bool = True) -> Dict[str, Any]:
+        """Cached or near-duplicate decision when ``reuse`` allows one, otherwise a crew run."""
+        start = time.perf_counter()
+        if self.cache is not None and reuse:
+            cached = self.cache.get(transaction, mode=mode)
+            if cached is not None:
+                METRICS.observe("fraud_transaction_seconds", time.perf_counter() - start, path="cache")
+                return {
+                    "decision": cached["decision"],
+                    "transaction": transaction,
+                    "rule": None,
+                    "cached": True,
+                    "setup_seconds": 0.0
+                }
+        match = self.similar.lookup(transaction) if self.similar is not None and reuse else None
+        if match is not None and not match["audit"]:
+            METRICS.observe("fraud_transaction_seconds", time.perf_counter() - start, path="similar")
+            return {
+                "decision": match["decision"],
+                "transaction": transaction,
+                "rule": None,
+                "cached": False,
+                "similar": {"similarity": match["similarity"], "transaction": match["transaction"]},
+                "setup_seconds": 0.0
+            }
+        result = self._run_cascade(transaction, callback, mode, run_id)
+        if match is not None:
+            # Audited hit: the crew decided anyway, so compare against what would have been reused
+            self.similar.verify(match["decision"], result["decision"])
+        if self.cache is not None:
+            self.cache.put(transaction, {"decision": result["decision"]}, mode=mode)
+        if self.similar is not None:
+            self.similar.add(transaction, result["decision"])
+        METRICS.observe("fraud_transaction_seconds", time.perf_counter() - start, path=mode)
+        return result
+
+    def _run_cascade(self, transaction: Dict[str, Any], callback=None, mode: str = "full",
+                     run_id: Optional[str] = None) -> Dict[str, Any]:
+        """``_run_crew`` on the cascade's cheap tier first when one is configured, escalating when unsure."""
+        if self.cascade is None:
+            return self._run_crew(transaction, callback, mode, run_id)
+        start = time.perf_counter()
+        cheap = self._run_crew(transaction, callback, mode, run_id, pool=self.cascade.pool)
+        reason = self.cascade.escalation_reason(cheap)
+        if reason is None:
+            self.cascade.record(time.perf_counter() - start, None)
+            return {**cheap, "cascade": {"escalated": False}}
+        # The strong run reports its stages under the same run id, after the cheap ones
+        result = self._run_crew(transaction, callback, mode, run_id)
+        self.cascade.record(time.perf_counter() - start, reason)
+        return {**result, "cascade": {
+            "escalated": True,
+            "reason": reason,
+            "cheap_decision": cheap["decision"],
+            "cheap_llm_calls": (cheap.get("stages") or {}).get("llm_calls", 0)
+        }}
+
+    def _run_crew(self, transaction: Dict[str, Any], callback=None, mode: str = "full",
+                  run_id: Optional[str] = None, pool: Optional[AgentPool] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        stages = None
+        with (pool or self.pool).acquire() as team:
+            if mode == "fast":
+                from crewai import Crew, Process
+                task = self.create_fast_task(transaction, team, callback)
+                crew = Crew(agents=[task.agent], tasks=[task], verbose=True, process=Process.sequential)
+                setup_seconds = time.perf_counter() - start
+                kickoff_start = time.perf_counter()
+                if run_id is not None:
+                    self.events.emit(run_id, STAGE_STARTED, "fast")
+                with stage_scope("fast"):
+                    result = crew.kickoff()
+                duration = time.perf_counter() - kickoff_start
+                METRICS.observe("fraud_stage_seconds", duration, stage="fast")
+                if run_id is not None:
+                    self.events.emit(run_id, STAGE_COMPLETED, "fast", output=str(result))
+                stages = {
+                    "timings": [{"stage": "fast", "start": 0.0, "end": duration, "duration": duration}],
+                    "wall_seconds": duration,
+                    "skipped": [],
+                    "outputs": {"fast": str(result)},
+                    # The single Fraud Analyst task is one LLM call
+                    "llm_calls": 1
+                }
+            else:
+                layout = DAG_INPUTS if mode == "dag" else SEQUENTIAL_INPUTS
+                context_stats: Dict[str, Dict[str, int]] = {}
+                graph = self.build_graph(transaction, team, callback, layout, context_stats, run_id)
+                setup_seconds = time.perf_counter() - start
+                run = graph.run(
+                    max_workers=None if mode == "dag" else 1,
+                    exit_check=self._risk_exit if self.risk_gate is not None else None
+                )
+                result = run.exit_result if run.exit_stage else run.outputs["decision"]
+                if run_id is not None:
+                    for stage in run.skipped:
+                        self.events.emit(run_id, STAGE_SKIPPED, stage, exit_stage=run.exit_stage)
+                for timing in run.timings:
+                    METRICS.observe("fraud_stage_seconds", timing["duration"], stage=timing["stage"])
+                stages = {
+                    "graph": graph.describe(),
+                    "timings": run.timings,
+                    "wall_seconds": run.wall_seconds,
+                    "skipped": run.skipped,
+                    "outputs": {name: str(output) for name, output in run.outputs.items()},
+                    # The local ingestion stage never calls the LLM
+                    "llm_calls": len(run.timings) - (0 if self.ingestion_mode == "llm" else 1),
+                    "context": context_stats
+                }
 
         # The final task is expected to return a JSON string 
         # with "decision" and "rationale"
         return {
-            "decision": result, 
-            "transaction": transaction
-        } 
\ No newline at end of file
+            "decision": str(result),
+            "transaction": transaction,
+            "rule": None,
+            "cached": False,
+            "mode": mode,
+            "stages": stages,
+            "setup_seconds": setup_seconds
+        }
+
+    def _risk_exit(self, stage: str, output: Any) -> Optional[str]:
+        return self.risk_gate.check(output) if stage == "risk" else None
+
+    def process_batch(self, transactions: List[Dict[str, Any]], max_concurrency: int = 4,
+                      mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Score many transactions concurrently, returning results in input order.
+
+        The rule engine, when configured, pre-filters the whole batch in one pass;
+        escalated transactions are served from the decision cache when possible
+        and otherwise reach the crew. Each in-flight crew run checks a
+        warm team out of the shared pool, so concurrency is also bounded by the pool
+        size. A failing transaction does not abort the batch: its result has
+        ``decision`` set to None and the message in ``error``. Every result gets its
+        own ``run_id``, under which it is recorded in the audit log.
+        """
+        mode = mode or self.mode
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        transactions = list(transactions)
+        results: List[Dict[str, Any]] = [None] * len(transactions)
+        reviews = [None] * len(transactions)
+        if self.velocity is not None:
+            self.velocity.record_many(transactions)
+            reviews = [self.velocity.needs_review(transaction) for transaction in transactions]
+
+        # Seconds each transaction took to decide, for the audit log; rule decisions share the batch evaluation
+        seconds = [0.0] * len(transactions)
+        start = time.perf_counter()
+        verdicts = self.rule_engine.evaluate_batch(transactions) if self.rule_engine is not None else [None] * len(transactions)
+        rule_seconds = (time.perf_counter() - start) / max(1, len(transactions))
+        escalated = []
+        for index, (transaction, verdict) in enumerate(zip(transactions, verdicts)):
+            if verdict is None or (reviews[index] and verdict.decision == "Approve"):
+                escalated.append(index)
+            else:
+                results[index] = self._rule_result(transaction, verdict)
+                results[index]["error"] = None
+                seconds[index] = rule_seconds
+
+        def score(index: int):
+            transaction = transactions[index]
+            start = time.perf_counter()
+            try:
+                result = dict(self._decide_once(transaction, mode=mode, reuse=reviews[index] is None))
+                result["error"] = None
+                if reviews[index]:
+                    result["velocity_review"] = reviews[index]
+            except Exception as e:
+                result = {"decision": None, "transaction": transaction, "error": str(e)}
+            results[index] = result
+            seconds[index] = time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            list(executor.map(score, escalated))
+        for transaction, result, elapsed in zip(transactions, results, seconds):
+            result["run_id"] = new_run_id()
+            self._observe(transaction, result)
+            self._audit(result, elapsed)
+        return results
+
+
+def decision_source(result: Dict[str, Any]) -> str:
+    """What produced a process_transaction result: rule, cache, similar, coalesced, crew or error."""
+    if result.get("error"):
+        return "error"
+    for source, key in (("rule", "rule"), ("cache", "cached"), ("similar", "similar"), ("coalesced", "coalesced")):
+        if result.get(key):
+            return source
+    return "crew"
+
+
+def batch_summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Where the decisions in a process_batch result came from, and how many LLM calls were avoided."""
+    summary = {"total": len(results), "errors": 0, "rule": 0, "cached": 0, "similar": 0, "coalesced": 0, "crew": 0,
+               "risk_gated": 0, "escalated": 0, "llm_calls": 0, "llm_calls_saved": 0}
+    for result in results:
+        if result.get("error"):
+            summary["errors"] += 1
+        elif result.get("rule"):
+            summary["rule"] += 1
+        elif result.get("cached"):
+            summary["cached"] += 1
+        elif result.get("similar"):
+            summary["similar"] += 1
+        elif result.get("coalesced"):
+            summary["coalesced"] += 1
+        else:
+            summary["crew"] += 1
+            stages = result.get("stages") or {}
+            summary["llm_calls"] += stages.get("llm_calls", 0)
+            if stages.get("skipped"):
+                summary["risk_gated"] += 1
+                summary["llm_calls_saved"] += len(stages["skipped"])
+            cascade = result.get("cascade") or {}
+            if cascade.get("escalated"):
+                summary["escalated"] += 1
+                summary["llm_calls"] += cascade.get("cheap_llm_calls", 0)
+    return summary
@@ -1,7 +1,7 @@
 import streamlit as st
-import time
 from typing import Dict, Any, List
 import json
+from utils.events import ProgressEvent, STAGE_STARTED, STAGE_COMPLETED, STAGE_SKIPPED
 
 class AgentFlowchart:
     def __init__(self):
@@ -123,12 +123,29 @@ class AgentFlowchart:
     def update_agent_status(self, agent_id: str, output: Dict[str, Any]):
         self.current_agent = agent_id
         self.agent_outputs[agent_id] = output
-        self.agent_status[agent_id] = "processing"
-        self.render_flowchart()
-        time.sleep(1)  # Animation delay
         self.agent_status[agent_id] = "completed"
         self.render_flowchart()
 
+    def apply_event(self, event: ProgressEvent) -> bool:
+        """Update state from a crew progress event without rendering; True when something changed.
+
+        Subscribe with ``EVENTS.subscribe(run_id)`` (or poll ``EVENTS.history``), apply
+        every pending event, then call ``render_flowchart`` once.
+        """
+        if event.stage not in self.agent_status:
+            return False
+        if event.kind == STAGE_STARTED:
+            self.current_agent = event.stage
+            self.agent_status[event.stage] = "processing"
+        elif event.kind == STAGE_COMPLETED:
+            self.agent_outputs[event.stage] = event.output
+            self.agent_status[event.stage] = "completed"
+        elif event.kind == STAGE_SKIPPED:
+            self.agent_status[event.stage] = "skipped"
+        else:
+            return False
+        return True
+
     def show_decision(self, decision: str):
         if decision in self.decisions:
             decision_info = self.decisions[decision]
@@ -0,0 +1,245 @@
+"""Asynchronous HTTP scoring service for machine-to-machine traffic.
+
+Runs alongside the Streamlit UI and shares the same process-wide crew:
+
+    python service.py --port 8080
+
+Endpoints:
+    POST /score        {"amount": ..., "location": ..., "description": ...}
+                       or {"transaction": {...}, "mode": "fast"}
+    POST /score/batch  {"transactions": [...], "mode": "full", "max_concurrency": 8}  (bounded by free service slots)
+    GET  /runs/{run_id}/events?after=<seq>   progress of a /score call (pass a fresh "run_id" in its body)
+    GET  /audit/{run_id}                     stored audit record of a decided run
+    GET  /audit?start=<unix>&end=<unix>&decision=Block&limit=100
+    GET  /health
+
+Scores come back in the Decision Maker contract, {"decision", "rationale"}, with a
+"source" field saying whether a rule, the cache, a near-duplicate, an identical
+in-flight run or the crew decided. A /score call the crew could not decide comes
+back with "decision": "ERROR" and status 503 when the LLM quota is exhausted
+(retry later) or 500 otherwise; /score/batch reports such failures per item.
+"""
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+
+from aiohttp import web
+
+from crew import get_crew, decision_source, warm_up, MODES
+from utils.metrics import METRICS
+from utils.parsing import parse_decision
+from utils.ratelimit import QuotaExceeded, is_quota_error
+
+MAX_BATCH_SIZE = 1000
+
+
+def to_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    if result.get("error"):
+        return {"decision": "ERROR", "rationale": result["error"], "source": "error"}
+    parsed = parse_decision(result["decision"])
+    response = {"decision": parsed["decision"], "rationale": parsed["rationale"], "source": decision_source(result)}
+    if result.get("run_id"):
+        response["run_id"] = result["run_id"]
+    return response
+
+
+class ScoringService:
+    """Admission control in front of the shared crew.
+
+    Waiting requests hold only a coroutine on the event loop. At most
+    ``max_in_flight`` crew runs execute at once, on a fixed thread pool, and
+    requests beyond ``max_queue`` waiting ones are rejected with 429. A batch
+    holds one slot per transaction it scores concurrently: it waits for one,
+    then takes whatever others are free, up to its ``max_concurrency``.
+    """
+
+    def __init__(self, max_in_flight: int = 32, max_queue: int = 1000):
+        self.crew = get_crew()
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="score")
+        self._waiting = 0
+        self._in_flight = 0
+        self._run_ids = set()  # Client-chosen run ids of requests still being scored
+
+    async def _acquire(self, wanted: int = 1) -> int:
+        if self._waiting >= self.max_queue:
+            raise web.HTTPTooManyRequests(text="Scoring queue is full")
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        slots = 1
+        # Only take slots that are free right now; waiting for several could deadlock two batches
+        while slots < wanted and not self._slots.locked():
+            await self._slots.acquire()
+            slots += 1
+        self._in_flight += slots
+        return slots
+
+    def _release(self, slots: int):
+        self._in_flight -= slots
+        for _ in range(slots):
+            self._slots.release()
+
+    async def _run(self, fn, *args):
+        granted = await self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._release(granted)
+
+    @staticmethod
+    async def _json_body(request: web.Request) -> Dict[str, Any]:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Request body must be JSON")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="Request body must be a JSON object")
+        return body
+
+    @staticmethod
+    def _mode(body: Dict[str, Any]) -> str:
+        mode = body.get("mode") or "full"
+        if mode not in MODES:
+            raise web.HTTPBadRequest(text=f"mode must be one of {', '.join(MODES)}")
+        return mode
+
+    async def score(self, request: web.Request) -> web.Response:
+        body = await self._json_body(request)
+        transaction = body.get("transaction", body)
+        if not isinstance(transaction, dict):
+            raise web.HTTPBadRequest(text="transaction must be a JSON object")
+        transaction = {key: value for key, value in transaction.items() if key not in ("mode", "run_id")}
+        mode = self._mode(body)
+        # Clients may choose the run id to follow progress on /runs/{run_id}/events while the request is open;
+        # it must not name another run, whose events and audit record it would otherwise be mixed with
+        run_id = str(body["run_id"]) if body.get("run_id") else None
+        if run_id is not None:
+            if run_id in self._run_ids or self.crew.events.known(run_id):
+                raise web.HTTPConflict(text="run_id is already in use; omit it to have one generated")
+            self._run_ids.add(run_id)
+        try:
+            result = await self._run(lambda: self.crew.process_transaction(transaction, mode=mode, run_id=run_id))
+        except web.HTTPException:
+            raise
+        except Exception as e:
+            status = 503 if isinstance(e, QuotaExceeded) or is_quota_error(e) else 500
+            return web.json_response(to_response({"error": str(e)}), status=status)
+        finally:
+            self._run_ids.discard(run_id)
+        return web.json_response(to_response(result))
+
+    async def score_batch(self, request: web.Request) -> web.Response:
+        body = await self._json_body(request)
+        transactions = body.get("transactions")
+        if not isinstance(transactions, list) or not all(isinstance(t, dict) for t in transactions):
+            raise web.HTTPBadRequest(text="transactions must be a list of JSON objects")
+        if len(transactions) > MAX_BATCH_SIZE:
+            raise web.HTTPRequestEntityTooLarge(max_size=MAX_BATCH_SIZE, actual_size=len(transactions))
+        mode = self._mode(body)
+        try:
+            max_concurrency = max(1, min(int(body.get("max_concurrency", 8)), 32))
+        except (TypeError, ValueError):
+            raise web.HTTPBadRequest(text="max_concurrency must be an integer")
+        slots = await self._acquire(max_concurrency)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, lambda: self.crew.process_batch(transactions, max_concurrency=slots, mode=mode)
+            )
+        finally:
+            self._release(slots)
+        return web.json_response({"results": [to_response(result) for result in results]})
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            # "warming" until crewai and the first agent team are loaded; requests are accepted meanwhile
+            "backend": warm_up()["status"],
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "pool": self.crew.pool.stats()
+        })
+
+    async def run_events(self, request: web.Request) -> web.Response:
+        try:
+            after = int(request.query.get("after", 0))
+        except ValueError:
+            raise web.HTTPBadRequest(text="after must be an integer")
+        events = self.crew.events.history(request.match_info["run_id"], after=after)
+        return web.json_response({"events": [
+            {"seq": e.seq, "kind": e.kind, "stage": e.stage, "timestamp": e.timestamp,
+             "output": None if e.output is None else str(e.output), **e.data}
+            for e in events
+        ]})
+
+    def _audit_log(self):
+        if self.crew.audit is None:
+            raise web.HTTPNotFound(text="The audit log is disabled")
+        return self.crew.audit
+
+    async def audit_record(self, request: web.Request) -> web.Response:
+        audit = self._audit_log()
+        record = await asyncio.get_running_loop().run_in_executor(None, audit.get, request.match_info["run_id"])
+        if record is None:
+            raise web.HTTPNotFound(text="Unknown run id")
+        return web.json_response(record, dumps=lambda value: json.dumps(value, default=str))
+
+    async def audit_query(self, request: web.Request) -> web.Response:
+        audit = self._audit_log()
+        try:
+            start = float(request.query["start"]) if "start" in request.query else None
+            end = float(request.query["end"]) if "end" in request.query else None
+            limit = max(1, min(int(request.query.get("limit", 100)), 1000))
+        except ValueError:
+            raise web.HTTPBadRequest(text="start and end must be Unix timestamps and limit an integer")
+        decision = request.query.get("decision")
+        records = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: audit.query(start=start, end=end, decision=decision, limit=limit)
+        )
+        return web.json_response({"records": records}, dumps=lambda value: json.dumps(value, default=str))
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=METRICS.to_prometheus(), content_type="text/plain")
+
+    async def close(self, app: web.Application):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_app(max_in_flight: int = 32, max_queue: int = 1000) -> web.Application:
+    service = ScoringService(max_in_flight=max_in_flight, max_queue=max_queue)
+    app = web.Application(client_max_size=4 * 1024 * 1024)
+    app.add_routes([
+        web.post("/score", service.score),
+        web.post("/score/batch", service.score_batch),
+        web.get("/runs/{run_id}/events", service.run_events),
+        web.get("/audit", service.audit_query),
+        web.get("/audit/{run_id}", service.audit_record),
+        web.get("/health", service.health),
+        web.get("/metrics", service.metrics),
+    ])
+    app.on_cleanup.append(service.close)
+    warm_up(teams=min(max_in_flight, 4))
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guardian Crew scoring service")
+    parser.add_argument("--host", default=os.getenv("FRAUD_SERVICE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("FRAUD_SERVICE_PORT", "8080")))
+    parser.add_argument("--max-in-flight", type=int, default=int(os.getenv("FRAUD_SERVICE_MAX_IN_FLIGHT", "32")),
+                        help="Concurrent crew runs (threads); further requests wait on the event loop")
+    parser.add_argument("--max-queue", type=int, default=int(os.getenv("FRAUD_SERVICE_MAX_QUEUE", "1000")),
+                        help="Waiting requests beyond this are rejected with 429")
+    args = parser.parse_args()
+    web.run_app(create_app(args.max_in_flight, args.max_queue), host=args.host, port=args.port, keepalive_timeout=75)
+
+
+if __name__ == "__main__":
+    main()
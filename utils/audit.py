@@ -0,0 +1,184 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from utils.metrics import METRICS
+from utils.parsing import parse_decision
+
+METRICS.describe("fraud_audit_records_total", "Decided runs handed to the audit log, by result (queued or dropped).")
+METRICS.describe("fraud_audit_batch_seconds", "Time to write and commit one batch of audit records.")
+
+_CLOSE = object()
+
+
+class AuditLog:
+    """Append-only store of every decided run: transaction, per-stage outputs and timings, final decision.
+
+    Rows live in one SQLite table (WAL journal) with the full record as
+    zlib-compressed JSON, indexed by run id, time and decision. Run ids are not
+    a unique key: a repeated id adds a row rather than replacing or dropping
+    one, and ``get`` returns the newest. ``record`` only
+    enqueues and never blocks the crew; a writer thread commits up to
+    ``batch_size`` records per transaction, at least every ``flush_seconds``.
+    Beyond ``max_pending`` queued records new ones are dropped and counted.
+    ``path=None`` keeps the table in memory, for benchmarks and tests only:
+    nothing survives the process.
+    """
+
+    def __init__(self, path: Optional[str] = None, batch_size: int = 256, flush_seconds: float = 0.5,
+                 max_pending: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._stats = {"recorded": 0, "written": 0, "batches": 0, "dropped": 0, "write_errors": 0}
+
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS runs (seq INTEGER PRIMARY KEY, run_id TEXT NOT NULL, recorded_at REAL NOT NULL, "
+            "decision TEXT, source TEXT, mode TEXT, seconds REAL, record BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS runs_run_id ON runs (run_id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS runs_recorded_at ON runs (recorded_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS runs_decision ON runs (decision, recorded_at)")
+        self._db.commit()
+
+        self._writer = threading.Thread(target=self._work, name="audit-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, result: Dict[str, Any], source: str, seconds: Optional[float] = None) -> bool:
+        """Queue a process_transaction / process_batch result (it must carry ``run_id``); False when dropped."""
+        try:
+            self._queue.put_nowait((time.time(), result, source, seconds))
+        except queue.Full:
+            self._count("dropped")
+            METRICS.inc("fraud_audit_records_total", result="dropped")
+            return False
+        self._count("recorded")
+        METRICS.inc("fraud_audit_records_total", result="queued")
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything recorded so far is committed; False on timeout."""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self):
+        self._queue.put(_CLOSE)
+        self._writer.join()
+        with self._lock:
+            self._db.close()
+
+    def _work(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            # Keep collecting until the batch is full, the deadline passes, or a flush or close is requested
+            while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write([item for item in batch if isinstance(item, tuple)])
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if batch[-1] is _CLOSE:
+                return
+
+    def _write(self, items: List[tuple]):
+        if not items:
+            return
+        start = time.perf_counter()
+        rows = [self._row(*item) for item in items]
+        try:
+            with self._lock:
+                cursor = self._db.executemany(
+                    "INSERT INTO runs (run_id, recorded_at, decision, source, mode, seconds, record) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+                written = cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Audit log write failed: {e}")
+            self._count("write_errors")
+            return
+        METRICS.observe("fraud_audit_batch_seconds", time.perf_counter() - start)
+        with self._lock:
+            self._stats["written"] += written
+            self._stats["batches"] += 1
+
+    @staticmethod
+    def _row(recorded_at: float, result: Dict[str, Any], source: str, seconds: Optional[float]) -> tuple:
+        decision = parse_decision(result["decision"])["decision"] if result.get("decision") else None
+        stages = dict(result.get("stages") or {})
+        stages.pop("graph", None)  # Static description of the pipeline, the same for every run
+        record = {
+            **result,
+            "stages": stages or None,
+            "source": source,
+            "decision_label": decision,
+            "recorded_at": recorded_at,
+            "seconds": seconds,
+        }
+        payload = zlib.compress(json.dumps(record, default=str).encode("utf-8"))
+        return (result["run_id"], recorded_at, decision, source, result.get("mode"), seconds, payload)
+
+    @staticmethod
+    def _load(payload: bytes) -> Dict[str, Any]:
+        return json.loads(zlib.decompress(payload))
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT record FROM runs WHERE run_id = ? ORDER BY seq DESC LIMIT 1", (run_id,)
+            ).fetchone()
+        return self._load(row[0]) if row is not None else None
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None, decision: Optional[str] = None,
+              limit: int = 100) -> List[Dict[str, Any]]:
+        """Records with ``start <= recorded_at < end`` (Unix seconds) and the given decision label, newest first."""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("recorded_at >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("recorded_at < ?")
+            params.append(end)
+        if decision is not None:
+            clauses.append("decision = ?")
+            params.append(decision)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT record FROM runs {where} ORDER BY recorded_at DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [self._load(row[0]) for row in rows]
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        batch = METRICS.histogram("fraud_audit_batch_seconds")
+        stats["batch_p95_seconds"] = batch.quantile(0.95) if batch else 0.0
+        return stats
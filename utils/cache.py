@@ -0,0 +1,119 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from utils.preprocess import parse_amount, normalize_text
+
+
+def transaction_key(transaction: Dict[str, Any]) -> str:
+    """Canonical hash of a transaction: amount to the cent, text fields trimmed and lower-cased."""
+    canonical = {}
+    for field, value in transaction.items():
+        if field == "amount":
+            amount, currency = parse_amount(value)
+            value = f"{amount:.2f} {currency}" if amount is not None else normalize_text(value)
+        elif isinstance(value, str):
+            value = normalize_text(value).lower()
+        canonical[field] = value
+    payload = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DecisionCache:
+    """LRU + TTL cache of final crew decisions, with an optional SQLite tier.
+
+    The in-memory tier holds at most ``max_entries`` items. When ``db_path`` is
+    given, every stored decision is also written to SQLite so it survives
+    restarts; a memory miss falls through to disk and promotes the entry back.
+    Entries older than ``ttl_seconds`` are treated as misses in both tiers.
+    Decisions are keyed by transaction and by the crew ``mode`` that produced
+    them, so a fast-mode verdict is never served to a full-mode request.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600.0, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS decisions (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _key(transaction: Dict[str, Any], mode: Optional[str]) -> str:
+        key = transaction_key(transaction)
+        return f"{mode}:{key}" if mode else key
+
+    def get(self, transaction: Dict[str, Any], mode: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        key = self._key(transaction, mode)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, stored_at FROM decisions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if now - row[1] <= self.ttl_seconds:
+                        value = json.loads(row[0])
+                        self._insert(key, row[1], value)
+                        self._counters["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM decisions WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._counters["expirations"] += 1
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, transaction: Dict[str, Any], value: Dict[str, Any], mode: Optional[str] = None):
+        key = self._key(transaction, mode)
+        now = time.time()
+        with self._lock:
+            self._insert(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO decisions (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now)
+                )
+                self._db.commit()
+
+    def _insert(self, key: str, stored_at: float, value: Dict[str, Any]):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM decisions")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+            lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+            return stats
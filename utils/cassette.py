@@ -0,0 +1,135 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+CASSETTE_MODES = ("record", "replay")
+
+
+def prompt_key(prompt: str, model: str = "") -> str:
+    return hashlib.sha256(f"{model}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a prompt was never recorded."""
+
+
+class CassetteStore:
+    """Prompt-hash -> response pairs in a single SQLite file, zlib-compressed.
+
+    With ``preload`` (the default for replay) the whole cassette is decompressed into
+    a dict on open, so lookups are a hash probe with no I/O. Writes go straight to
+    SQLite, which keeps recording safe across concurrent crews and restarts.
+    """
+
+    def __init__(self, path: str, preload: bool = True):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response BLOB NOT NULL, recorded_at REAL NOT NULL)")
+        self._db.commit()
+        self._memory: Optional[Dict[str, str]] = None
+        if preload:
+            self._memory = {
+                key: zlib.decompress(blob).decode("utf-8")
+                for key, blob in self._db.execute("SELECT key, response FROM responses")
+            }
+
+    def get(self, key: str) -> Optional[str]:
+        if self._memory is not None:
+            return self._memory.get(key)
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def put(self, key: str, response: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, recorded_at) VALUES (?, ?, ?)",
+                (key, zlib.compress(response.encode("utf-8")), time.time())
+            )
+            self._db.commit()
+            if self._memory is not None:
+                self._memory[key] = response
+
+    def __len__(self) -> int:
+        if self._memory is not None:
+            return len(self._memory)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class CassetteChatModel(BaseChatModel):
+    """Chat model that records another model's answers, or replays them offline.
+
+    ``record`` forwards every call to ``inner`` and stores the answer under the
+    hash of the model name and prompt. ``replay`` serves stored answers, sleeping
+    ``latency`` seconds per call to simulate the real service; a prompt that was
+    never recorded raises CassetteMiss unless ``inner`` is set to fall back on.
+    """
+
+    store: Any
+    mode: str = "replay"
+    inner: Optional[Any] = None
+    latency: float = 0.0
+    model: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cassette-{self.mode}"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = "\n".join(f"{message.type}: {message.content}" for message in messages)
+        key = prompt_key(prompt, self.model)
+
+        if self.mode == "replay":
+            text = self.store.get(key)
+            if text is not None:
+                if self.latency > 0:
+                    time.sleep(self.latency)
+                return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+            if self.inner is None:
+                raise CassetteMiss(f"No recorded response for prompt {key[:12]}")
+
+        message = self.inner.invoke(messages, stop=stop, **kwargs)
+        if self.mode == "record":
+            self.store.put(key, str(message.content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+_stores: Dict[str, CassetteStore] = {}
+_stores_lock = threading.Lock()
+
+def open_store(path: str) -> CassetteStore:
+    """One shared store per cassette file, so every model built by a factory reuses it."""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = CassetteStore(path)
+        return store
+
+
+def cassette_factory(path: str, mode: str, inner_factory=None, latency: float = 0.0):
+    """Build an LLM factory (see ``crew.set_llm_factory``) that records or replays through ``path``."""
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"Unknown cassette mode: {mode}")
+    if mode == "record" and inner_factory is None:
+        raise ValueError("Recording needs an inner_factory to call the real model")
+    store = open_store(path)
+
+    def factory(model: str, temperature: float, callbacks=None):
+        inner = inner_factory(model, temperature) if inner_factory is not None else None
+        return CassetteChatModel(
+            store=store, mode=mode, inner=inner, latency=latency,
+            model=f"{model}@{temperature}", callbacks=callbacks
+        )
+
+    return factory
@@ -0,0 +1,133 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from utils.metrics import METRICS
+from utils.parsing import extract_json, parse_risk
+
+METRICS.describe("fraud_context_tokens_total", "Tokens of upstream stage output handed to later stages, before (raw) and after (compact) compaction.")
+
+# Keys worth forwarding when a stage answered in JSON
+STAGE_KEYS = {
+    "ingestion": ("amount", "currency", "location", "description", "amount_bucket",
+                  "missing_amount", "missing_location", "missing_description", "unknown_location", "negative_amount"),
+    "anomaly": ("anomalies", "severity", "indicators"),
+    "risk": ("risk_score", "justification"),
+    "investigation": ("indicators", "findings", "fraud_indicators", "summary"),
+}
+# Field name a prose answer's key sentences are filed under
+PROSE_FIELD = {"anomaly": "anomalies", "investigation": "indicators"}
+INDICATOR_TERMS = (
+    "anomal", "unusual", "suspicious", "fraud", "risk", "mismatch", "high", "low", "exceed", "inconsistent",
+    "history", "location", "amount", "velocity", "pattern", "indicator", "severity", "flag", "block", "approve"
+)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def count_tokens(text: Any) -> int:
+    """Approximate token count (about four characters per token), matching the quota governor's estimate."""
+    return len(str(text)) // 4 if text else 0
+
+
+def _key_sentences(text: str, budget: int) -> List[str]:
+    """Highest-signal sentences of a prose answer, in their original order, within ``budget`` tokens."""
+    sentences = [s.strip(" -*•\t") for s in _SENTENCE_SPLIT.split(text)]
+    sentences = [s for s in sentences if len(s) > 3 and not s.lower().startswith(("thought:", "final answer"))]
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-sum(term in sentences[i].lower() for term in INDICATOR_TERMS) - bool(re.search(r"\d", sentences[i])), i)
+    )
+    chosen, used = [], 0
+    for i in ranked:
+        cost = count_tokens(sentences[i]) + 2
+        if used + cost > budget:
+            continue
+        chosen.append(i)
+        used += cost
+    return [sentences[i] for i in sorted(chosen)]
+
+
+# Successively tighter (longest string, longest list) limits tried until a summary fits its budget
+TRUNCATION_STEPS = [(400, None), (200, None), (100, None), (60, None), (60, 4), (30, 2), (16, 1)]
+
+
+def _truncate(value: Any, max_chars: int, max_items: Optional[int] = None) -> Any:
+    """Cut strings to ``max_chars`` and lists to ``max_items``, at any depth."""
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars].rstrip() + "..."
+    if isinstance(value, list):
+        return [_truncate(item, max_chars, max_items) for item in value[:max_items]]
+    if isinstance(value, dict):
+        return {key: _truncate(item, max_chars, max_items) for key, item in value.items()}
+    return value
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+class ContextCompactor:
+    """Reduces each stage's answer to a compact JSON summary before later stages see it.
+
+    Compaction is deterministic and local (no extra LLM call): JSON answers keep
+    only the fields downstream agents use, prose answers keep their
+    highest-signal sentences, and everything is trimmed to ``budget_tokens``
+    per stage (``stage_budgets`` overrides individual stages). Raw and compact
+    token counts go to ``fraud_context_tokens_total``.
+    """
+
+    def __init__(self, budget_tokens: int = 150, stage_budgets: Optional[Dict[str, int]] = None):
+        self.budget_tokens = budget_tokens
+        self.stage_budgets = stage_budgets or {}
+
+    def budget(self, stage: str) -> int:
+        return self.stage_budgets.get(stage, self.budget_tokens)
+
+    def summarize(self, stage: str, output: Any) -> Dict[str, Any]:
+        budget = self.budget(stage)
+        if stage == "risk":
+            risk = parse_risk(output)
+            if risk is not None:
+                return {"risk_score": risk["risk_score"], "justification": risk["justification"]}
+        parsed = extract_json(output)
+        if parsed is not None:
+            keys = STAGE_KEYS.get(stage)
+            summary = {
+                key: value for key, value in parsed.items()
+                if (keys is None or key in keys) and value not in (None, False, "", [])
+            }
+            if summary:
+                return summary
+        return {PROSE_FIELD.get(stage, "summary"): _key_sentences(str(output), budget)}
+
+    def compact(self, stage: str, output: Any) -> str:
+        """The stage's summary as JSON of at most ``budget(stage)`` tokens."""
+        budget = self.budget(stage)
+        summary = self.summarize(stage, output)
+        text = _dumps(summary)
+        # Shorten strings, then lists, at every depth until the summary fits
+        for max_chars, max_items in TRUNCATION_STEPS:
+            if count_tokens(text) <= budget:
+                return text
+            summary = _truncate(summary, max_chars, max_items)
+            text = _dumps(summary)
+        # Then drop trailing fields (the first listed are the ones downstream agents rely on most)
+        while count_tokens(text) > budget and len(summary) > 1:
+            summary = dict(list(summary.items())[:-1])
+            text = _dumps(summary)
+        if count_tokens(text) > budget:
+            # Tiny budgets: keep the head of the summary as one string
+            head = text
+            text = "{}"
+            for room in range((budget + 1) * 4 - len(_dumps({"summary": ""})), 0, -1):
+                candidate = _dumps({"summary": head[:room]})
+                if count_tokens(candidate) <= budget:
+                    text = candidate
+                    break
+        return text
+
+    def record(self, stage: str, raw: Any, compact: str) -> Dict[str, int]:
+        counts = {"raw_tokens": count_tokens(raw), "compact_tokens": count_tokens(compact)}
+        METRICS.inc("fraud_context_tokens_total", counts["raw_tokens"], stage=stage, phase="raw")
+        METRICS.inc("fraud_context_tokens_total", counts["compact_tokens"], stage=stage, phase="compact")
+        return counts
@@ -0,0 +1,121 @@
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Event kinds, in the order a run emits them
+RUN_STARTED = "run_started"
+STAGE_STARTED = "stage_started"
+STAGE_COMPLETED = "stage_completed"
+STAGE_SKIPPED = "stage_skipped"
+RUN_FINISHED = "run_finished"
+RUN_FAILED = "run_failed"
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+@dataclass
+class ProgressEvent:
+    run_id: str
+    kind: str
+    # Pipeline stage the event belongs to ("ingestion", ..., "decision", or "fast"); None for run events
+    stage: Optional[str] = None
+    output: Any = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    seq: int = 0
+    timestamp: float = field(default_factory=time.time)
+
+
+class Subscription:
+    """Push-style stream of events for one run (or every run), fed by ``EventBus.emit``."""
+
+    def __init__(self, bus: "EventBus", run_id: Optional[str]):
+        self.bus = bus
+        self.run_id = run_id
+        self._queue: "queue.SimpleQueue[ProgressEvent]" = queue.SimpleQueue()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[ProgressEvent]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self) -> List[ProgressEvent]:
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Run-scoped progress pub/sub.
+
+    Producers call ``emit``, which never blocks: it appends to the run's bounded
+    history and hands the event to each subscriber's unbounded SimpleQueue,
+    reading a copy-on-write tuple of subscribers without taking a lock.
+    Consumers either ``subscribe`` for pushed events or poll ``history(run_id,
+    after=seq)``, which also lets a late subscriber catch up. Histories of the
+    newest ``max_runs`` runs are kept.
+    """
+
+    def __init__(self, max_runs: int = 1000, max_events_per_run: int = 256):
+        self.max_runs = max_runs
+        self.max_events_per_run = max_events_per_run
+        self._histories: Dict[str, deque] = {}
+        self._subscribers: Dict[Optional[str], Tuple[Subscription, ...]] = {}
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def open_run(self, run_id: str):
+        """Register a run before it emits; also where old runs are pruned, keeping ``emit`` lock-free."""
+        with self._lock:
+            self._histories.setdefault(run_id, deque(maxlen=self.max_events_per_run))
+            while len(self._histories) > self.max_runs:
+                del self._histories[next(iter(self._histories))]
+
+    def emit(self, run_id: str, kind: str, stage: Optional[str] = None, output: Any = None, **data) -> ProgressEvent:
+        event = ProgressEvent(run_id=run_id, kind=kind, stage=stage, output=output, data=data, seq=next(self._seq))
+        history = self._histories.get(run_id)
+        if history is not None:
+            history.append(event)
+        for subscription in self._subscribers.get(run_id, ()) + self._subscribers.get(None, ()):
+            subscription._queue.put_nowait(event)
+        return event
+
+    def known(self, run_id: str) -> bool:
+        """Whether ``run_id`` is one of the runs whose history is still kept."""
+        return run_id in self._histories
+
+    def history(self, run_id: str, after: int = 0) -> List[ProgressEvent]:
+        """Events of ``run_id`` with ``seq`` greater than ``after``, oldest first."""
+        return [event for event in list(self._histories.get(run_id, ())) if event.seq > after]
+
+    def subscribe(self, run_id: Optional[str] = None) -> Subscription:
+        """Receive future events of ``run_id``, or of every run when None."""
+        subscription = Subscription(self, run_id)
+        with self._lock:
+            self._subscribers[run_id] = self._subscribers.get(run_id, ()) + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            remaining = tuple(s for s in self._subscribers.get(subscription.run_id, ()) if s is not subscription)
+            if remaining:
+                self._subscribers[subscription.run_id] = remaining
+            else:
+                self._subscribers.pop(subscription.run_id, None)
+
+
+# Process-wide bus the crew reports to
+EVENTS = EventBus()
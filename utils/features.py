@@ -0,0 +1,220 @@
+import hashlib
+import math
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, so one process per directory
+    fcntl = None
+
+import numpy as np
+
+from utils.preprocess import normalize_text, parse_amount
+
+# Log-spaced amount bins for the per-key quantile sketch: 1 to 10M, plus under/overflow
+SKETCH_EDGES = np.logspace(0, 7, 31)
+SKETCH_BINS = len(SKETCH_EDGES) + 1
+# Columns of the per-key stats array (Welford's running moments)
+COUNT, MEAN, M2 = 0, 1, 2
+# Fields of the per-table header: slot count the files were created with, keys held
+HEADER_CAPACITY, HEADER_SIZE = 0, 1
+
+DIMENSIONS = ("location", "description")
+# Slots per table (about 170 MB of arrays, touched lazily); the 0.9 load limit leaves
+# room for about 940k keys. Raise it with a directory for millions of keys.
+DEFAULT_CAPACITY = 1 << 20
+
+
+def key_hash(value: str) -> int:
+    """Stable non-zero 64-bit hash of a normalized key; 0 marks an empty slot."""
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class FeatureTable:
+    """Running amount statistics for one dimension (e.g. location), keyed by hashed value.
+
+    An open-addressing hash table over three NumPy arrays: key hashes, running
+    count/mean/M2, and a fixed log-bucket histogram per key for quantiles. With
+    ``path`` the arrays are ``np.memmap`` files that persist across restarts and
+    are paged in on demand, so millions of keys never become Python objects.
+    Updates and lookups are O(1); once 90% of ``capacity`` keys are held new
+    keys are counted in ``dropped`` rather than stored.
+
+    A small header file records the capacity and the number of keys, so
+    reopening with a different capacity raises ValueError instead of misreading
+    the arrays. Several processes (e.g. the app and the scoring service) may
+    share a directory: every update holds an exclusive ``flock`` on the table's
+    lock file and every lookup a shared one (POSIX only).
+    """
+
+    def __init__(self, name: str, capacity: int = DEFAULT_CAPACITY, path: Optional[str] = None):
+        self.name = name
+        self.capacity = capacity
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(path, f"{name}.lock"), "a+b") if path is not None and fcntl else None
+        with self._locked(exclusive=True):
+            self.header = self._array(path, f"{name}.header", np.int64, (2,))
+            if self.header[HEADER_CAPACITY] not in (0, capacity):
+                raise ValueError(
+                    f"Feature table {name} in {path} was created with capacity {int(self.header[HEADER_CAPACITY])}, "
+                    f"not {capacity}"
+                )
+            self.keys = self._array(path, f"{name}.keys", np.uint64, (capacity,))
+            self.stats = self._array(path, f"{name}.stats", np.float64, (capacity, 3))
+            self.sketch = self._array(path, f"{name}.sketch", np.uint32, (capacity, SKETCH_BINS))
+            if self.header[HEADER_CAPACITY] == 0:
+                self.header[HEADER_CAPACITY] = capacity
+                self.header[HEADER_SIZE] = np.count_nonzero(self.keys)
+
+    @property
+    def size(self) -> int:
+        return int(self.header[HEADER_SIZE])
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        with self._lock:
+            if self._lock_file is None:
+                yield
+                return
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _array(path: Optional[str], filename: str, dtype, shape):
+        if path is None:
+            return np.zeros(shape, dtype=dtype)
+        file_path = os.path.join(path, filename)
+        if not os.path.exists(file_path):
+            return np.memmap(file_path, dtype=dtype, mode="w+", shape=shape)
+        expected = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        actual = os.path.getsize(file_path)
+        if actual != expected:
+            raise ValueError(
+                f"{file_path} holds {actual} bytes but capacity {shape[0]} needs {expected}; "
+                f"reopen it with the capacity it was created with or move it aside"
+            )
+        return np.memmap(file_path, dtype=dtype, mode="r+", shape=shape)
+
+    def _slot(self, hashed: int, insert: bool) -> Optional[int]:
+        # Linear probing; the load limit keeps probe chains short
+        index = hashed % self.capacity
+        for _ in range(self.capacity):
+            current = int(self.keys[index])
+            if current == hashed:
+                return index
+            if current == 0:
+                if not insert or self.header[HEADER_SIZE] >= self.capacity * 0.9:
+                    return None
+                self.keys[index] = hashed
+                self.header[HEADER_SIZE] += 1
+                return index
+            index = (index + 1) % self.capacity
+        return None
+
+    def update(self, key: str, amount: float):
+        with self._locked(exclusive=True):
+            slot = self._slot(key_hash(key), insert=True)
+            if slot is None:
+                self.dropped += 1
+                return
+            row = self.stats[slot]
+            count = row[COUNT] + 1
+            delta = amount - row[MEAN]
+            mean = row[MEAN] + delta / count
+            row[M2] += delta * (amount - mean)
+            row[MEAN] = mean
+            row[COUNT] = count
+            self.sketch[slot, np.searchsorted(SKETCH_EDGES, amount)] += 1
+
+    def features(self, key: str, amount: Optional[float]) -> Optional[Dict[str, Any]]:
+        """Count, mean, std, p50/p95 and, for ``amount``, its z-score and percentile within the key."""
+        with self._locked(exclusive=False):
+            slot = self._slot(key_hash(key), insert=False)
+            if slot is None:
+                return None
+            count, mean, m2 = (float(v) for v in self.stats[slot])
+            sketch = np.array(self.sketch[slot], dtype=np.float64)
+        std = math.sqrt(m2 / (count - 1)) if count > 1 else 0.0
+        cumulative = np.cumsum(sketch) / count
+        result = {
+            "count": int(count),
+            "mean": round(mean, 2),
+            "std": round(std, 2),
+            "p50": _sketch_quantile(cumulative, 0.5),
+            "p95": _sketch_quantile(cumulative, 0.95),
+        }
+        if amount is not None:
+            result["z_score"] = round((amount - mean) / std, 2) if std > 0 else 0.0
+            below = np.searchsorted(SKETCH_EDGES, amount)
+            result["percentile"] = round(100 * float(cumulative[below - 1]) if below > 0 else 0.0, 1)
+        return result
+
+    def flush(self):
+        for array in (self.header, self.keys, self.stats, self.sketch):
+            if isinstance(array, np.memmap):
+                array.flush()
+
+
+def _sketch_quantile(cumulative: np.ndarray, q: float) -> float:
+    """Geometric midpoint of the bin holding quantile ``q``."""
+    index = int(np.searchsorted(cumulative, q))
+    lower = SKETCH_EDGES[index - 1] if index > 0 else 0.0
+    upper = SKETCH_EDGES[min(index, len(SKETCH_EDGES) - 1)]
+    return round(math.sqrt(lower * upper) if lower > 0 else upper / 2, 2)
+
+
+class FeatureStore:
+    """Amount history per location and per description, for the Anomaly Detector.
+
+    ``features`` reads the history of a transaction's keys (call it before
+    ``update`` so a transaction is never compared against itself). Without
+    ``path`` the tables live in RAM and are lost on restart.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, path: Optional[str] = None):
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.tables = {dimension: FeatureTable(dimension, capacity, path) for dimension in DIMENSIONS}
+
+    @staticmethod
+    def _keys(transaction: Dict[str, Any]) -> Dict[str, str]:
+        return {dimension: normalize_text(transaction.get(dimension)).lower() for dimension in DIMENSIONS}
+
+    def features(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
+        amount, _ = parse_amount(transaction.get("amount"))
+        result = {}
+        for dimension, key in self._keys(transaction).items():
+            if key:
+                result[dimension] = self.tables[dimension].features(key, amount)
+        return result
+
+    def update(self, transaction: Dict[str, Any]):
+        amount, _ = parse_amount(transaction.get("amount"))
+        if amount is None or amount < 0:
+            return
+        for dimension, key in self._keys(transaction).items():
+            if key:
+                self.tables[dimension].update(key, amount)
+
+    def update_many(self, transactions: Iterable[Dict[str, Any]]):
+        for transaction in transactions:
+            self.update(transaction)
+
+    def flush(self):
+        for table in self.tables.values():
+            table.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            dimension: {"keys": table.size, "capacity": table.capacity, "dropped": table.dropped}
+            for dimension, table in self.tables.items()
+        }
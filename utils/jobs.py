@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from utils.metrics import METRICS
+
+METRICS.describe("fraud_job_wait_seconds", "Time a submitted job waited in the queue before a worker picked it up.")
+METRICS.describe("fraud_job_run_seconds", "Time a worker spent running a job.")
+
+QueueFull = queue.Full
+
+
+class Job:
+    """One queued crew run and everything a poller needs to follow it."""
+
+    def __init__(self, transaction: Dict[str, Any], mode: str):
+        self.id = uuid.uuid4().hex
+        self.transaction = transaction
+        self.mode = mode
+        self.status = "queued"  # queued -> running -> done | failed
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def wait_seconds(self) -> float:
+        return (self.started_at or time.time()) - self.submitted_at
+
+    @property
+    def run_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobQueue:
+    """Process-wide FIFO of crew runs served by a fixed set of daemon worker threads.
+
+    ``submit`` returns immediately; callers poll ``get(job_id)``. At most
+    ``max_queue`` jobs wait (``submit`` raises QueueFull beyond that) and the
+    newest ``history`` finished jobs stay available for lookup.
+    """
+
+    def __init__(self, run: Callable[[Job], Dict[str, Any]], workers: int = 4, max_queue: int = 1000,
+                 history: int = 1000):
+        self.run = run
+        self.history = history
+        self._queue: "queue.Queue[Job]" = queue.Queue(maxsize=max_queue)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0}
+        self._workers = [
+            threading.Thread(target=self._work, name=f"crew-job-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, transaction: Dict[str, Any], mode: str = "full") -> Job:
+        job = Job(transaction, mode)
+        self._queue.put_nowait(job)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._stats["submitted"] += 1
+            self._trim()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _trim(self):
+        # Drop the oldest finished jobs; unfinished ones are never evicted
+        excess = len(self._jobs) - self.history
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job.done][:excess]
+        for job_id in finished:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            job.status = "running"
+            METRICS.observe("fraud_job_wait_seconds", job.wait_seconds)
+            with self._lock:
+                self._running += 1
+            try:
+                job.result = self.run(job)
+                job.status = "done"
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                METRICS.observe("fraud_job_run_seconds", job.run_seconds)
+                with self._lock:
+                    self._running -= 1
+                    self._stats["completed" if job.status == "done" else "failed"] += 1
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["running"] = self._running
+        stats["queue_depth"] = self._queue.qsize()
+        stats["workers"] = len(self._workers)
+        wait = METRICS.histogram("fraud_job_wait_seconds")
+        stats["wait_p50_seconds"] = wait.quantile(0.5) if wait else 0.0
+        stats["wait_p95_seconds"] = wait.quantile(0.95) if wait else 0.0
+        return stats
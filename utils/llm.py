@@ -1,29 +1,130 @@
 import os
-from typing import Dict, Any
-import google.generativeai as genai
+import time
+import asyncio
+import threading
+import weakref
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 
+from utils.ratelimit import QuotaExceeded, estimate_tokens, get_governor
+
 load_dotenv()
 
 class GeminiLLM:
-    def __init__(self):
+    def __init__(self, cassette_path: Optional[str] = None, cassette_mode: Optional[str] = None,
+                 replay_latency: float = 0.0, max_connections: int = 16, timeout: float = 60.0):
         self.api_key = os.getenv("GEMINI_API_KEY")
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
-        else:
-            self.model = None
+        self.model_name = 'gemini-pro'
+        # The Gemini SDK is imported and configured on the first call, not at construction
+        self._model = None
+        self._model_lock = threading.Lock()
+
+        # Async path: the SDK multiplexes concurrent calls over one pooled grpc.aio channel;
+        # max_connections bounds how many are in flight per event loop
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._limits_lock = threading.Lock()
+
+        # Optional record/replay of responses (see utils/cassette.py)
+        self.cassette = None
+        self.cassette_mode = cassette_mode
+        self.replay_latency = replay_latency
+        if cassette_path and cassette_mode:
+            from utils.cassette import open_store, CASSETTE_MODES
+            if cassette_mode not in CASSETTE_MODES:
+                raise ValueError(f"Unknown cassette mode: {cassette_mode}")
+            self.cassette = open_store(cassette_path)
+
+    @property
+    def model(self):
+        """The SDK model client, or None without an API key."""
+        if self._model is None and self.api_key:
+            with self._model_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def _replay(self, prompt: str):
+        """Return (cassette key, recorded response); both None when no cassette applies."""
+        if self.cassette is None:
+            return None, None
+        from utils.cassette import prompt_key
+        key = prompt_key(prompt, self.model_name)
+        if self.cassette_mode == "replay":
+            return key, self.cassette.get(key)
+        return key, None
+
+    def _record(self, key: Optional[str], text: str):
+        if key is not None and self.cassette_mode == "record":
+            self.cassette.put(key, text)
 
     def generate(self, prompt: str) -> str:
+        key, recorded = self._replay(prompt)
+        if recorded is not None:
+            if self.replay_latency > 0:
+                time.sleep(self.replay_latency)
+            return recorded
+
         if self.model:
             try:
-                response = self.model.generate_content(prompt)
+                response = get_governor().call(
+                    lambda: self.model.generate_content(prompt, request_options={"timeout": self.timeout}),
+                    estimate_tokens(prompt)
+                )
+                self._record(key, response.text)
                 return response.text
+            except QuotaExceeded:
+                # Never answer quota exhaustion with a fabricated mock verdict
+                raise
             except Exception as e:
                 print(f"Error with Gemini API: {e}")
                 return self._mock_response(prompt)
         return self._mock_response(prompt)
 
+    def _limit(self) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop, so keep one per running loop
+        loop = asyncio.get_running_loop()
+        with self._limits_lock:
+            limit = self._limits.get(loop)
+            if limit is None:
+                limit = self._limits[loop] = asyncio.Semaphore(self.max_connections)
+            return limit
+
+    async def generate_async(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Non-blocking generate: many calls can overlap on one event loop."""
+        key, recorded = self._replay(prompt)
+        if recorded is not None:
+            if self.replay_latency > 0:
+                await asyncio.sleep(self.replay_latency)
+            return recorded
+
+        if self.model:
+            timeout = timeout or self.timeout
+            async def call():
+                async with self._limit():
+                    return await asyncio.wait_for(
+                        self.model.generate_content_async(prompt, request_options={"timeout": timeout}),
+                        timeout=timeout
+                    )
+
+            try:
+                response = await get_governor().call_async(call, estimate_tokens(prompt))
+                self._record(key, response.text)
+                return response.text
+            except QuotaExceeded:
+                raise
+            except Exception as e:
+                print(f"Error with Gemini API: {e!r}")
+                return self._mock_response(prompt)
+        return self._mock_response(prompt)
+
+    async def generate_many(self, prompts: List[str], timeout: Optional[float] = None) -> List[str]:
+        """Generate for every prompt concurrently (bounded by max_connections), preserving order."""
+        return list(await asyncio.gather(*(self.generate_async(prompt, timeout) for prompt in prompts)))
+
     def _mock_response(self, prompt: str) -> str:
         """Fallback mock response for testing"""
         if "risk" in prompt.lower():
@@ -35,5 +136,26 @@ class GeminiLLM:
         else:
             return "Decision: Flag for review\nReason: Requires additional verification."
 
-# Singleton instance
-llm = GeminiLLM() 
\ No newline at end of file
+_llm: Optional[GeminiLLM] = None
+_llm_lock = threading.Lock()
+
+def get_gemini_llm() -> GeminiLLM:
+    """Process-wide GeminiLLM, built on first use; FRAUD_LLM_BACKEND=record/replay routes it through the cassette."""
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            backend = os.getenv("FRAUD_LLM_BACKEND", "gemini")
+            _llm = GeminiLLM(
+                cassette_path=os.getenv("FRAUD_CASSETTE_PATH", "llm_cassette.db") if backend in ("record", "replay") else None,
+                cassette_mode=backend if backend in ("record", "replay") else None,
+                replay_latency=float(os.getenv("FRAUD_CASSETTE_LATENCY", "0")),
+                max_connections=int(os.getenv("GEMINI_MAX_CONNECTIONS", "16")),
+                timeout=float(os.getenv("GEMINI_TIMEOUT", "60"))
+            )
+        return _llm
+
+def __getattr__(name: str):
+    # Keeps ``from utils.llm import llm`` working without building the client at import
+    if name == "llm":
+        return get_gemini_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+# Upper bounds in seconds; LLM stages take from a few hundred ms to tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"')) for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Histogram:
+    """Cumulative Prometheus-style buckets plus a sliding window of recent samples for quantiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 10000):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, exportable in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(name, {}).get(_label_key(labels))
+
+    def histograms(self, name: str) -> Dict[LabelKey, Histogram]:
+        with self._lock:
+            return dict(self._histograms.get(name, {}))
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def summary(self) -> Dict[str, Any]:
+        """Counters plus count/mean/p50/p95/p99 per histogram series, for dashboards and logs."""
+        with self._lock:
+            result: Dict[str, Any] = {}
+            for name, series in self._counters.items():
+                result[name] = {_format_labels(key) or "total": value for key, value in series.items()}
+            for name, series in self._histograms.items():
+                result[name] = {
+                    _format_labels(key) or "all": {
+                        "count": h.count,
+                        "mean": h.sum / h.count if h.count else 0.0,
+                        **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}
+                    }
+                    for key, h in series.items()
+                }
+            return result
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    for upper, count in zip(h.buckets, h.counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{upper:g}'))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+                # Pre-computed quantiles over the recent window, exposed as a companion gauge
+                quantile_name = f"{name}_quantile"
+                lines.append(f"# TYPE {quantile_name} gauge")
+                for key, h in series.items():
+                    for q in QUANTILES:
+                        lines.append(f"{quantile_name}{_format_labels(key, ('quantile', f'{q:g}'))} {h.quantile(q):g}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Atomically write the metrics for the node_exporter textfile collector (or any scraper)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Process-wide registry used by the crew, the LLM layer and any entry point
+METRICS = MetricsRegistry()
+METRICS.describe("fraud_stage_seconds", "Wall time of each pipeline stage.")
+METRICS.describe("fraud_llm_seconds", "Latency of individual LLM calls, by stage.")
+METRICS.describe("fraud_llm_prompt_tokens_total", "Prompt tokens sent to the LLM, by stage.")
+METRICS.describe("fraud_llm_completion_tokens_total", "Completion tokens returned by the LLM, by stage.")
+METRICS.describe("fraud_llm_retries_total", "LLM call retries, by stage.")
+METRICS.describe("fraud_llm_errors_total", "Failed LLM calls, by stage.")
+METRICS.describe("fraud_transaction_seconds", "End-to-end time to decide a transaction, by decision path.")
+METRICS.describe("fraud_cascade_seconds", "Crew time per transaction under the model cascade, by path (cheap or escalated).")
+METRICS.describe("fraud_cascade_escalations_total", "Transactions re-run on the strong model tier, by reason.")
+
+
+def start_http_server(port: int, registry: MetricsRegistry = METRICS, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` from a daemon thread; usable from any entry point, not just Streamlit."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# Which pipeline stage the current thread is running, so LLM callbacks can be attributed to it
+_stage_context = threading.local()
+
+
+@contextmanager
+def stage_scope(stage: str):
+    """Mark the pipeline stage that LLM calls on this thread belong to."""
+    previous = getattr(_stage_context, "stage", None)
+    _stage_context.stage = stage
+    try:
+        yield
+    finally:
+        _stage_context.stage = previous
+
+
+def current_stage() -> str:
+    return getattr(_stage_context, "stage", None) or "unknown"
+
+
+def _token_usage(response) -> Tuple[int, int]:
+    """Prompt/completion tokens from a LangChain LLMResult, whichever way the provider reports them."""
+    prompt = completion = 0
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt += usage.get("input_tokens", 0)
+            completion += usage.get("output_tokens", 0)
+    if not (prompt or completion):
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        prompt = usage.get("prompt_tokens", 0) or usage.get("prompt_token_count", 0)
+        completion = usage.get("completion_tokens", 0) or usage.get("candidates_token_count", 0)
+    return prompt, completion
+
+
+def llm_metrics_handler(registry: MetricsRegistry = METRICS):
+    """LangChain callback handler recording LLM latency, tokens, retries and errors per stage."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsHandler(BaseCallbackHandler):
+        def __init__(self):
+            self._starts: Dict[Any, Tuple[float, str]] = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._starts[run_id] = (time.perf_counter(), current_stage())
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._starts[run_id] = (time.perf_counter(), current_stage())
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            start, stage = self._starts.pop(run_id, (None, current_stage()))
+            if start is not None:
+                registry.observe("fraud_llm_seconds", time.perf_counter() - start, stage=stage)
+            prompt, completion = _token_usage(response)
+            registry.inc("fraud_llm_prompt_tokens_total", prompt, stage=stage)
+            registry.inc("fraud_llm_completion_tokens_total", completion, stage=stage)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            _, stage = self._starts.pop(run_id, (None, current_stage()))
+            registry.inc("fraud_llm_errors_total", stage=stage)
+
+        def on_retry(self, retry_state, *, run_id, **kwargs):
+            registry.inc("fraud_llm_retries_total", stage=current_stage())
+
+    return LLMMetricsHandler()
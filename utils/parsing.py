@@ -0,0 +1,65 @@
+import json
+from typing import Dict, Any, Optional
+
+DECISIONS = ("Approve", "Flag", "Block")
+
+
+def extract_json(text: Any) -> Optional[Dict[str, Any]]:
+    """Pull the first ``{...}`` object out of an LLM answer (markdown fences and prose tolerated)."""
+    if text is None:
+        return None
+    cleaned = str(text).strip().strip('`')
+    start = cleaned.find('{')
+    end = cleaned.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    candidate = cleaned[start:end + 1]
+    try:
+        parsed = json.loads(candidate)
+    except json.JSONDecodeError:
+        # Agents sometimes answer with Python-style single quotes, as in the task examples
+        try:
+            parsed = json.loads(candidate.replace("'", '"'))
+        except json.JSONDecodeError:
+            return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def normalize_decision(value: Any) -> str:
+    """Map free-form decision text onto Approve / Flag / Block, or "Unknown"."""
+    upper = str(value or "").upper()
+    if "BLOCK" in upper:
+        return "Block"
+    if "FLAG" in upper or "REVIEW" in upper:
+        return "Flag"
+    if "APPROVE" in upper:
+        return "Approve"
+    return "Unknown"
+
+
+def parse_decision(raw: Any) -> Dict[str, Any]:
+    """Parse the Decision Maker's output into decision, rationale and whether the JSON was valid."""
+    parsed = extract_json(raw)
+    if parsed is not None and "decision" in parsed:
+        return {
+            "decision": normalize_decision(parsed.get("decision")),
+            "rationale": parsed.get("rationale", "Rationale not provided by agent."),
+            "parsed": True
+        }
+    return {
+        "decision": normalize_decision(raw),
+        "rationale": f"Agent output could not be parsed as JSON: {raw}",
+        "parsed": False
+    }
+
+
+def parse_risk(raw: Any) -> Optional[Dict[str, Any]]:
+    """Read ``risk_score`` and ``justification`` from the Risk Analyst's JSON answer."""
+    parsed = extract_json(raw)
+    if parsed is None:
+        return None
+    try:
+        score = float(parsed.get("risk_score"))
+    except (TypeError, ValueError):
+        return None
+    return {"risk_score": score, "justification": parsed.get("justification", "")}
@@ -0,0 +1,131 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional, Sequence
+
+
+@dataclass
+class Stage:
+    name: str
+    inputs: Sequence[str]
+    # Receives {input stage name: output} and returns this stage's output
+    run: Callable[[Dict[str, Any]], Any]
+
+
+@dataclass
+class PipelineRun:
+    outputs: Dict[str, Any] = field(default_factory=dict)
+    # One entry per executed stage: name, start, end and duration in seconds from run start
+    timings: List[Dict[str, Any]] = field(default_factory=list)
+    wall_seconds: float = 0.0
+    # Set when an exit check ended the run early
+    exit_stage: Optional[str] = None
+    exit_result: Any = None
+    skipped: List[str] = field(default_factory=list)
+
+
+class StageGraph:
+    """A dependency graph of pipeline stages.
+
+    Each stage declares the stages whose outputs it consumes; stages whose inputs
+    are all available run concurrently.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage '{name}'")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def describe(self) -> Dict[str, List[str]]:
+        return {name: list(self.stages[name].inputs) for name in self.order}
+
+    def depth(self, name: Optional[str] = None) -> int:
+        """Number of stages on the longest dependency chain (ending at ``name`` if given)."""
+        depths: Dict[str, int] = {}
+        for stage_name in self.order:
+            inputs = self.stages[stage_name].inputs
+            depths[stage_name] = 1 + max((depths[dep] for dep in inputs), default=0)
+        return depths[name] if name else max(depths.values(), default=0)
+
+    def to_mermaid(self) -> str:
+        lines = ["graph LR"]
+        for name in self.order:
+            inputs = self.stages[name].inputs
+            if not inputs:
+                lines.append(f"    {name}")
+            for dependency in inputs:
+                lines.append(f"    {dependency} --> {name}")
+        return "\n".join(lines)
+
+    def run(self, max_workers: Optional[int] = None,
+            exit_check: Optional[Callable[[str, Any], Any]] = None) -> PipelineRun:
+        """Execute the graph, starting each stage as soon as its inputs are ready.
+
+        ``exit_check(stage, output)`` is called after every stage; a non-None return
+        value ends the run early: no further stages are started, stages already
+        running are allowed to finish, and the value is stored as ``exit_result``.
+        The first stage failure cancels stages that have not started and is re-raised.
+        """
+        result = PipelineRun()
+        run_start = time.perf_counter()
+        pending = dict(self.stages)
+        running = {}
+
+        def execute(stage: Stage):
+            inputs = {name: result.outputs[name] for name in stage.inputs}
+            start = time.perf_counter()
+            output = stage.run(inputs)
+            end = time.perf_counter()
+            return output, start - run_start, end - run_start
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.stages) or 1) as executor:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if result.exit_stage is None and all(dep in result.outputs for dep in stage.inputs):
+                        running[executor.submit(execute, stage)] = name
+                        del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        output, start, end = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    result.outputs[name] = output
+                    result.timings.append({"stage": name, "start": start, "end": end, "duration": end - start})
+                    if exit_check is not None and result.exit_stage is None:
+                        exit_result = exit_check(name, output)
+                        if exit_result is not None:
+                            result.exit_stage, result.exit_result = name, exit_result
+
+                if result.exit_stage is not None and pending and not running:
+                    result.skipped = [name for name in self.order if name in pending]
+                    pending.clear()
+
+        result.wall_seconds = time.perf_counter() - run_start
+        return result
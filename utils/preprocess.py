@@ -0,0 +1,92 @@
+import math
+import re
+from typing import Dict, Any, Optional, Tuple
+
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "₹": "INR"}
+UNKNOWN_LOCATIONS = {"", "unknown", "n/a", "na", "none", "null"}
+
+# Upper bounds (exclusive) of the amount buckets handed to the agents
+AMOUNT_BUCKETS = [
+    (10.0, "micro"),
+    (100.0, "small"),
+    (1000.0, "medium"),
+    (10000.0, "large"),
+    (float("inf"), "very_large"),
+]
+
+_CODE_RE = re.compile(r"\b([A-Za-z]{3})\b")
+
+
+def parse_amount(value: Any, default_currency: str = "USD") -> Tuple[Optional[float], str]:
+    """Coerce an amount such as ``4.75``, ``"$1,000"`` or ``"50 EUR"`` to (float, ISO currency).
+
+    The amount is None when it cannot be parsed or is not finite (``"inf"``, ``"nan"``, JSON ``1e999``).
+    """
+    if value is None or isinstance(value, bool):
+        return None, default_currency
+    if isinstance(value, (int, float)):
+        try:
+            amount = float(value)
+        except OverflowError:
+            return None, default_currency
+        return (amount if math.isfinite(amount) else None), default_currency
+
+    text = str(value).strip()
+    currency = default_currency
+    for symbol, code in CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            currency = code
+            text = text.replace(symbol, "")
+    match = _CODE_RE.search(text)
+    if match:
+        currency = match.group(1).upper()
+        text = _CODE_RE.sub("", text)
+    try:
+        amount = float(text.replace(",", "").strip())
+    except ValueError:
+        return None, currency
+    return (amount if math.isfinite(amount) else None), currency
+
+
+def normalize_text(value: Any) -> str:
+    """Trim and collapse internal whitespace."""
+    if value is None:
+        return ""
+    return " ".join(str(value).split())
+
+
+def amount_bucket(amount: Optional[float]) -> str:
+    if amount is None:
+        return "unknown"
+    for upper, name in AMOUNT_BUCKETS:
+        if amount < upper:
+            return name
+    return AMOUNT_BUCKETS[-1][1]
+
+
+def preprocess_transaction(transaction: Dict[str, Any]) -> Dict[str, Any]:
+    """Deterministic replacement for the Data Ingestion agent.
+
+    Produces the structured context the downstream agents consume: coerced amount
+    and currency, cleaned text fields, and derived features.
+    """
+    amount, currency = parse_amount(transaction.get("amount"), str(transaction.get("currency") or "USD").upper())
+    location = normalize_text(transaction.get("location"))
+    description = normalize_text(transaction.get("description"))
+
+    processed = {
+        "amount": round(amount, 2) if amount is not None else None,
+        "currency": currency,
+        "location": location.title(),
+        "description": description,
+        "amount_bucket": amount_bucket(amount),
+        "missing_amount": amount is None,
+        "missing_location": not location,
+        "missing_description": not description,
+        "unknown_location": location.lower() in UNKNOWN_LOCATIONS,
+        "negative_amount": amount is not None and amount < 0,
+    }
+    # Carry through any extra fields (e.g. card or account identifiers) untouched
+    for key, value in transaction.items():
+        processed.setdefault(key, value)
+    return processed
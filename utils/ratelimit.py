@@ -0,0 +1,307 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.metrics import METRICS, current_stage
+
+METRICS.describe("fraud_llm_throttled_total", "LLM calls rejected by the provider for quota or rate limits.")
+
+
+class QuotaExceeded(RuntimeError):
+    """The provider kept returning quota errors after every retry."""
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """429 / RESOURCE_EXHAUSTED from the Gemini SDK, gRPC or any HTTP wrapper around them."""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+        return True
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    text = str(error).lower()
+    return "429" in text or "resource_exhausted" in text or "quota" in text or "rate limit" in text
+
+
+class TokenBucket:
+    """Reservation-based token bucket refilled continuously at ``per_minute`` / 60 per second.
+
+    ``reserve`` always succeeds and returns how long the caller must wait before
+    proceeding, which serves callers in arrival order and works the same from
+    threads and coroutines.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, per_minute / 60.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def adjust(self, amount: float):
+        """Correct an earlier reservation once the real cost is known (positive charges more)."""
+        with self._lock:
+            self._tokens -= amount
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on concurrent calls.
+
+    The limit grows by one after each full window of successful calls that finish
+    under ``latency_target`` seconds, and halves on a throttle or a slow call, never
+    dropping below ``min_limit`` or rising above ``max_limit``. A burst of throttles
+    from calls that were already in flight halves the limit only once per
+    ``cooldown`` seconds.
+
+    Thread and coroutine callers wait in one FIFO queue, and ``release`` hands a
+    freed slot directly to the longest waiter: a thread through its Event, a
+    coroutine by resolving its future on its own loop.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 64, latency_target: float = 20.0,
+                 cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters: deque = deque()  # threading.Event or (loop, future), oldest first
+
+    def _take(self) -> bool:
+        # Called with the lock held; never overtakes a queued waiter
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            return self._take()
+
+    def acquire(self):
+        with self._lock:
+            if self._take():
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._take():
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter not in self._waiters
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                # The slot was handed over as the caller was cancelled; pass it on
+                self.release()
+            raise
+
+    def _hand_over(self):
+        # Called with the lock held
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+                continue
+            loop, future = waiter
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:  # Its event loop is closed; nobody will take the slot
+                self.in_flight -= 1
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False):
+        with self._lock:
+            self.in_flight -= 1
+            if throttled or (latency is not None and latency > self.latency_target):
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._last_decrease = now
+            elif latency is not None:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._hand_over()
+
+
+def _resolve(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(None)
+
+
+class QuotaGovernor:
+    """Shared gate for every Gemini call: request and token budgets, AIMD concurrency,
+    and jittered exponential backoff on quota errors."""
+
+    def __init__(self, requests_per_minute: float = 1000, tokens_per_minute: float = 1000000,
+                 concurrency: Optional[AdaptiveConcurrency] = None, max_attempts: int = 6,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute, burst=tokens_per_minute / 6)
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "throttled": 0, "retries": 0, "failed": 0}
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform between 0 and the exponential ceiling
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _admission_wait(self, estimated_tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: int = 1000) -> Any:
+        for attempt in range(self.max_attempts):
+            time.sleep(self._admission_wait(estimated_tokens))
+            self.concurrency.acquire()
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_quota_error(e):
+                    self.concurrency.release()
+                    raise
+                self.concurrency.release(throttled=True)
+                if self._on_throttle(attempt, e):
+                    time.sleep(self.backoff(attempt))
+                continue
+            self.concurrency.release(latency=time.perf_counter() - start)
+            self._count("calls")
+            return result
+        self._count("failed")
+        raise QuotaExceeded(f"Gemini quota still exhausted after {self.max_attempts} attempts")
+
+    async def call_async(self, fn: Callable[[], Any], estimated_tokens: int = 1000) -> Any:
+        """Like ``call`` for a coroutine factory; waits without blocking the event loop."""
+        for attempt in range(self.max_attempts):
+            await asyncio.sleep(self._admission_wait(estimated_tokens))
+            await self.concurrency.acquire_async()
+            start = time.perf_counter()
+            try:
+                result = await fn()
+            except Exception as e:
+                if not is_quota_error(e):
+                    self.concurrency.release()
+                    raise
+                self.concurrency.release(throttled=True)
+                if self._on_throttle(attempt, e):
+                    await asyncio.sleep(self.backoff(attempt))
+                continue
+            self.concurrency.release(latency=time.perf_counter() - start)
+            self._count("calls")
+            return result
+        self._count("failed")
+        raise QuotaExceeded(f"Gemini quota still exhausted after {self.max_attempts} attempts")
+
+    def _on_throttle(self, attempt: int, error: BaseException) -> bool:
+        """Record a throttle; True when another attempt follows."""
+        self._count("throttled")
+        METRICS.inc("fraud_llm_throttled_total", stage=current_stage())
+        if attempt + 1 >= self.max_attempts:
+            return False
+        self._count("retries")
+        METRICS.inc("fraud_llm_retries_total", stage=current_stage())
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["concurrency_limit"] = int(self.concurrency.limit)
+        stats["in_flight"] = self.concurrency.in_flight
+        return stats
+
+
+_governor: Optional[QuotaGovernor] = None
+_governor_lock = threading.Lock()
+
+def get_governor() -> QuotaGovernor:
+    """Process-wide governor shared by the crew's chat clients and GeminiLLM."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = QuotaGovernor(
+                requests_per_minute=float(os.getenv("GEMINI_RPM", "1000")),
+                tokens_per_minute=float(os.getenv("GEMINI_TPM", "1000000")),
+                concurrency=AdaptiveConcurrency(
+                    initial=int(os.getenv("GEMINI_INITIAL_CONCURRENCY", "4")),
+                    max_limit=int(os.getenv("GEMINI_MAX_CONCURRENCY", "64")),
+                    latency_target=float(os.getenv("GEMINI_LATENCY_TARGET", "20"))
+                )
+            )
+        return _governor
+
+
+def estimate_tokens(text: str, completion_allowance: int = 512) -> int:
+    """Cheap pre-call estimate (about four characters per token) plus room for the answer."""
+    return len(text) // 4 + completion_allowance
+
+
+@lru_cache(maxsize=None)
+def governed_chat_model():
+    """The GovernedChatModel class, built on first use so importing this module does not load LangChain."""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import BaseMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    class GovernedChatModel(BaseChatModel):
+        """Wraps a LangChain chat model so every call goes through the quota governor."""
+
+        inner: Any
+        governor: Any = None
+
+        @property
+        def _llm_type(self) -> str:
+            return f"governed-{getattr(self.inner, '_llm_type', 'chat')}"
+
+        def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                      run_manager: Any = None, **kwargs: Any) -> ChatResult:
+            governor = self.governor or get_governor()
+            estimate = estimate_tokens("".join(str(message.content) for message in messages))
+            message = governor.call(lambda: self.inner.invoke(messages, stop=stop, **kwargs), estimate)
+            usage = getattr(message, "usage_metadata", None) or {}
+            if usage.get("total_tokens"):
+                governor.tokens.adjust(usage["total_tokens"] - estimate)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    return GovernedChatModel
+
+
+def governed(factory):
+    """Wrap an LLM factory (see ``crew.set_llm_factory``) so its clients share the process-wide governor.
+
+    Callbacks stay on the inner client, so LLM metrics time the provider call rather
+    than time spent queued for quota.
+    """
+
+    def build(model: str, temperature: float, callbacks=None):
+        return governed_chat_model()(inner=factory(model, temperature, callbacks=callbacks))
+
+    return build
@@ -0,0 +1,127 @@
+import json
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.preprocess import parse_amount, UNKNOWN_LOCATIONS
+
+
+@dataclass
+class RuleConfig:
+    # Amount thresholds are in this currency; amounts in any other currency never fire an amount rule
+    currency: str = "USD"
+    # Clear-cut approvals: small purchases at a known location
+    approve_max_amount: float = 50.0
+    # Routine merchants (by description keyword) are approved up to this amount
+    routine_max_amount: float = 250.0
+    routine_keywords: Sequence[str] = (
+        "coffee", "cafe", "grocery", "groceries", "bakery", "lunch",
+        "parking", "transit", "subway", "bus fare", "pharmacy"
+    )
+    # Clear-cut blocks
+    block_min_amount: float = 100000.0
+    block_keywords: Sequence[str] = ("gift card", "wire transfer", "crypto", "bitcoin", "money order")
+    unknown_locations: Sequence[str] = tuple(sorted(UNKNOWN_LOCATIONS))
+
+
+@dataclass
+class RuleResult:
+    decision: str  # "Approve" or "Block"
+    rule: str
+    rationale: str
+
+    def to_output(self) -> str:
+        """The same JSON contract the Decision Maker agent produces."""
+        return json.dumps({"decision": self.decision, "rationale": self.rationale})
+
+
+# Evaluated in order; the first matching rule wins
+RULES = [
+    ("block_extreme_amount", "Block", "Amount at or above the hard block threshold."),
+    ("block_keyword_unknown_location", "Block", "High-risk payment type with no identifiable location."),
+    ("approve_small_amount", "Approve", "Small purchase at a known location with no high-risk indicators."),
+    ("approve_routine_merchant", "Approve", "Routine merchant category within the everyday spending limit."),
+]
+
+
+def _to_amount(transaction: Dict[str, Any]) -> Tuple[float, str]:
+    amount, currency = parse_amount(transaction.get("amount"), str(transaction.get("currency") or "USD").upper())
+    return (float("nan") if amount is None else amount), currency
+
+
+def _contains_any(texts: np.ndarray, keywords: Sequence[str]) -> np.ndarray:
+    hits = np.zeros(texts.shape, dtype=bool)
+    for keyword in keywords:
+        hits |= np.char.find(texts, keyword) >= 0
+    return hits
+
+
+class RuleEngine:
+    """Deterministic pre-LLM stage that decides obvious transactions.
+
+    Transactions that no rule matches are escalated to the agent crew. Rules are
+    evaluated with NumPy over whole batches, so pre-filtering N transactions is a
+    handful of array operations rather than N Python loops.
+    """
+
+    def __init__(self, config: Optional[RuleConfig] = None):
+        self.config = config or RuleConfig()
+        self._lock = threading.Lock()
+        self._evaluated = 0
+        self._fired = {name: 0 for name, _, _ in RULES}
+
+    def evaluate(self, transaction: Dict[str, Any]) -> Optional[RuleResult]:
+        return self.evaluate_batch([transaction])[0]
+
+    def evaluate_batch(self, transactions: List[Dict[str, Any]]) -> List[Optional[RuleResult]]:
+        if not transactions:
+            return []
+        cfg = self.config
+
+        parsed = [_to_amount(t) for t in transactions]
+        amounts = np.array([amount for amount, _ in parsed], dtype=float)
+        currencies = np.array([currency for _, currency in parsed], dtype=str)
+        locations = np.char.lower(np.char.strip(np.array([str(t.get("location") or "") for t in transactions], dtype=str)))
+        descriptions = np.char.lower(np.array([str(t.get("description") or "") for t in transactions], dtype=str))
+
+        # Amount rules only apply to parseable amounts in the configured currency
+        priced = ~np.isnan(amounts) & (currencies == cfg.currency.upper())
+        # Negative amounts (refunds, reversals, bad input) are never auto-approved
+        approvable = priced & (amounts >= 0)
+        known_location = ~np.isin(locations, [loc.lower() for loc in cfg.unknown_locations])
+        risky_keyword = _contains_any(descriptions, cfg.block_keywords)
+        routine_keyword = _contains_any(descriptions, cfg.routine_keywords)
+
+        conditions = [
+            priced & (amounts >= cfg.block_min_amount),
+            risky_keyword & ~known_location,
+            approvable & (amounts <= cfg.approve_max_amount) & known_location & ~risky_keyword,
+            approvable & (amounts <= cfg.routine_max_amount) & known_location & routine_keyword & ~risky_keyword,
+        ]
+        # -1 means no rule fired and the transaction is escalated
+        fired = np.select(conditions, list(range(len(RULES))), default=-1)
+
+        results: List[Optional[RuleResult]] = []
+        with self._lock:
+            self._evaluated += len(transactions)
+            for index in fired.tolist():
+                if index < 0:
+                    results.append(None)
+                    continue
+                name, decision, rationale = RULES[index]
+                self._fired[name] += 1
+                results.append(RuleResult(decision=decision, rule=name, rationale=f"{rationale} (rule: {name})"))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            absorbed = sum(self._fired.values())
+            return {
+                "evaluated": self._evaluated,
+                "absorbed": absorbed,
+                "escalated": self._evaluated - absorbed,
+                "absorbed_share": absorbed / self._evaluated if self._evaluated else 0.0,
+                "rules": dict(self._fired)
+            }
@@ -0,0 +1,181 @@
+import math
+import random
+import re
+import threading
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import METRICS
+from utils.parsing import parse_decision
+from utils.preprocess import normalize_text, parse_amount
+from utils.velocity import ACCOUNT_FIELDS
+
+METRICS.describe("fraud_similar_lookups_total", "Near-duplicate cache lookups, by result (hit or miss).")
+METRICS.describe("fraud_similar_false_reuse_total", "Audited near-duplicate hits whose decision differed from a fresh crew run.")
+
+DESCRIPTION_DIM = 256
+LOCATION_DIM = 64
+# Runs of letters and runs of digits, so "iPhone15" and "iphone 15" give the same tokens
+_TOKEN = re.compile(r"[a-z]+|[0-9]+")
+
+
+def tokenize(text: Any) -> Tuple[list, Tuple[str, ...]]:
+    """Lower-cased word tokens and the sorted numeric tokens (leading zeros dropped) of ``text``."""
+    tokens = _TOKEN.findall(normalize_text(text).lower())
+    words = [token for token in tokens if not token.isdigit()]
+    numbers = tuple(sorted(token.lstrip("0") or "0" for token in tokens if token.isdigit()))
+    return words, numbers
+
+
+def match_key(transaction: Dict[str, Any]) -> int:
+    """Hash of what must be equal for a match: the card/account identifier and the description's numbers."""
+    account = next((value for value in (normalize_text(transaction.get(f)) for f in ACCOUNT_FIELDS) if value), "")
+    _, numbers = tokenize(transaction.get("description"))
+    return zlib.crc32(f"{account}|{' '.join(numbers)}".encode("utf-8"))
+
+
+def hashed_features(words: list, dim: int, n: int = 3) -> np.ndarray:
+    """Unit-length bag of hashed word tokens plus each word's character n-grams (which absorb typos)."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in words:
+        vector[zlib.crc32(f"w:{word}".encode("utf-8")) % dim] += 1.0
+        padded = f"^{word}$"
+        for i in range(max(1, len(padded) - n + 1)):
+            vector[zlib.crc32(padded[i:i + n].encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SimilarTransactionIndex:
+    """Reuses a prior crew decision for a near-duplicate transaction.
+
+    Similarity is the weighted cosine of hashed word and character n-gram
+    vectors for description and location, scaled down as the amounts diverge
+    (to zero at ``amount_tolerance`` relative difference). Case, spacing and
+    punctuation are ignored, but numbers in the description must match exactly:
+    "iPhone 15" can match "iphone15 pro", never "iPhone 16". The newest ``max_entries``
+    decisions are kept in preallocated NumPy arrays and searched by brute-force
+    matrix product; with ``partitioned`` (the default) only entries whose
+    log-amount bucket is within tolerance are scored, which keeps lookups
+    sublinear as the index grows. A decision is only ever reused for the same
+    card/account (or between transactions that carry none), so one card's
+    verdict never decides another's.
+
+    ``audit_rate`` of hits are handed back for a fresh crew run so the share of
+    hits that would have changed the decision (false reuse) can be measured.
+    """
+
+    def __init__(self, threshold: float = 0.86, max_entries: int = 20000, amount_tolerance: float = 0.1,
+                 description_weight: float = 0.6, partitioned: bool = True, audit_rate: float = 0.05):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.amount_tolerance = amount_tolerance
+        self.description_weight = description_weight
+        self.partitioned = partitioned
+        self.audit_rate = audit_rate
+        self._descriptions = np.zeros((max_entries, DESCRIPTION_DIM), dtype=np.float32)
+        self._locations = np.zeros((max_entries, LOCATION_DIM), dtype=np.float32)
+        self._log_amounts = np.zeros(max_entries, dtype=np.float64)
+        self._partition_of: list = [None] * max_entries
+        self._key_of = np.zeros(max_entries, dtype=np.int64)
+        self._decisions: list = [None] * max_entries
+        self._partitions: Dict[Tuple[int, int], set] = {}
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "audited": 0, "false_reuse": 0}
+
+    def _encode(self, transaction: Dict[str, Any]) -> Optional[Tuple[np.ndarray, np.ndarray, float, int]]:
+        amount, _ = parse_amount(transaction.get("amount"))
+        if amount is None or amount <= 0:
+            return None
+        return (
+            hashed_features(tokenize(transaction.get("description"))[0], DESCRIPTION_DIM),
+            hashed_features(tokenize(transaction.get("location"))[0], LOCATION_DIM),
+            math.log(amount),
+            match_key(transaction)
+        )
+
+    def _partition(self, log_amount: float, key: int) -> Tuple[int, int]:
+        return key, int(log_amount // math.log1p(self.amount_tolerance))
+
+    def add(self, transaction: Dict[str, Any], decision: str):
+        encoded = self._encode(transaction)
+        if encoded is None:
+            return
+        description, location, log_amount, key = encoded
+        partition = self._partition(log_amount, key)
+        with self._lock:
+            row = self._next
+            if self._size == self.max_entries:
+                self._partitions[self._partition_of[row]].discard(row)
+            self._descriptions[row] = description
+            self._locations[row] = location
+            self._log_amounts[row] = log_amount
+            self._partition_of[row] = partition
+            self._key_of[row] = key
+            self._decisions[row] = {"decision": decision, "transaction": transaction}
+            self._partitions.setdefault(partition, set()).add(row)
+            self._next = (row + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def lookup(self, transaction: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Best prior decision at or above the threshold, as ``{"decision", "transaction", "similarity", "audit"}``."""
+        encoded = self._encode(transaction)
+        match = None
+        if encoded is not None:
+            with self._lock:
+                match = self._search(*encoded)
+        if match is None:
+            self._count("misses")
+            METRICS.inc("fraud_similar_lookups_total", result="miss")
+            return None
+        self._count("hits")
+        METRICS.inc("fraud_similar_lookups_total", result="hit")
+        match["audit"] = random.random() < self.audit_rate
+        return match
+
+    def _search(self, description: np.ndarray, location: np.ndarray, log_amount: float,
+                key: int) -> Optional[Dict[str, Any]]:
+        if self._size == 0:
+            return None
+        if self.partitioned:
+            _, bucket = self._partition(log_amount, key)
+            rows = [row for b in (bucket - 1, bucket, bucket + 1) for row in self._partitions.get((key, b), ())]
+            rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        else:
+            rows = np.flatnonzero(self._key_of[:self._size] == key)
+        if not len(rows):
+            return None
+        text = (self.description_weight * (self._descriptions[rows] @ description)
+                + (1 - self.description_weight) * (self._locations[rows] @ location))
+        amount = np.clip(1 - np.abs(self._log_amounts[rows] - log_amount) / math.log1p(self.amount_tolerance), 0, 1)
+        scores = text * amount
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return {**self._decisions[int(rows[best])], "similarity": round(float(scores[best]), 4)}
+
+    def verify(self, reused_decision: str, actual_decision: str) -> bool:
+        """Record the outcome of an audited hit; True when reusing would have been wrong."""
+        wrong = parse_decision(reused_decision)["decision"] != parse_decision(actual_decision)["decision"]
+        self._count("audited")
+        if wrong:
+            self._count("false_reuse")
+            METRICS.inc("fraud_similar_false_reuse_total")
+        return wrong
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["false_reuse_rate"] = stats["false_reuse"] / stats["audited"] if stats["audited"] else 0.0
+        return stats
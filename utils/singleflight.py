@@ -0,0 +1,72 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from utils.metrics import METRICS
+
+METRICS.describe("fraud_singleflight_collapsed_total", "Calls that waited on an identical in-flight run instead of starting their own.")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key onto one execution.
+
+    The first caller for a key runs ``fn``; callers that arrive while it is in
+    flight block until it finishes and receive the same result (or exception).
+    Nothing is remembered once the call completes, so this complements the
+    decision cache rather than replacing it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"leaders": 0, "collapsed": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` once per in-flight key; returns (result, shared) where shared marks a follower."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._stats["collapsed"] += 1
+                leader = False
+
+        if not leader:
+            METRICS.inc("fraud_singleflight_collapsed_total")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        total = stats["leaders"] + stats["collapsed"]
+        stats["collapse_rate"] = stats["collapsed"] / total if total else 0.0
+        return stats
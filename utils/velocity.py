@@ -0,0 +1,168 @@
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.preprocess import normalize_text, parse_amount
+
+# Window name -> (bucket width in seconds, number of buckets)
+WINDOWS = {
+    "1m": (1, 60),
+    "1h": (60, 60),
+    "24h": (900, 96),
+}
+# Transaction fields that identify the card or account, first match wins
+ACCOUNT_FIELDS = ("card_id", "card", "account_id", "account")
+# Card/account counts per window above which a transaction always gets a full crew review
+REVIEW_LIMITS = {"1m": 3, "1h": 20}
+
+
+class RingCounter:
+    """Count and amount sum over a sliding window, as a ring of fixed-width time buckets.
+
+    Each slot remembers which bucket it holds, so stale slots are reset lazily on
+    write and ignored on read; no background expiry is needed.
+    """
+
+    __slots__ = ("width", "stamps", "counts", "sums")
+
+    def __init__(self, width: int, buckets: int):
+        self.width = width
+        self.stamps = [-1] * buckets
+        self.counts = [0] * buckets
+        self.sums = [0.0] * buckets
+
+    def add(self, now: float, amount: float):
+        bucket = int(now // self.width)
+        slot = bucket % len(self.stamps)
+        if self.stamps[slot] != bucket:
+            self.stamps[slot] = bucket
+            self.counts[slot] = 0
+            self.sums[slot] = 0.0
+        self.counts[slot] += 1
+        self.sums[slot] += amount
+
+    def totals(self, now: float) -> Tuple[int, float]:
+        oldest = int(now // self.width) - len(self.stamps)
+        count, total = 0, 0.0
+        for stamp, c, s in zip(self.stamps, self.counts, self.sums):
+            if stamp > oldest:
+                count += c
+                total += s
+        return count, total
+
+
+class _Shard:
+    __slots__ = ("lock", "entries", "last_seen")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: Dict[str, List[RingCounter]] = {}
+        self.last_seen: Dict[str, float] = {}
+
+
+class VelocityTracker:
+    """1m/1h/24h transaction counts and amount sums per location, description and card/account.
+
+    Keys are spread over ``shards`` independently locked dicts, so concurrent
+    writers only contend when they hash to the same shard. Keys idle for longer
+    than the widest window are pruned every ``prune_every`` updates per shard.
+
+    ``needs_review`` reports card/account bursts (e.g. card testing) above
+    ``review_limits`` so callers can skip fast paths that would replay an
+    approval.
+    """
+
+    def __init__(self, shards: int = 16, prune_every: int = 10000, review_limits: Optional[Dict[str, int]] = None):
+        self._shards = [_Shard() for _ in range(shards)]
+        self.prune_every = prune_every
+        self.review_limits = dict(REVIEW_LIMITS if review_limits is None else review_limits)
+        self._reviews = 0
+        self._reviews_lock = threading.Lock()
+        self._horizon = max(width * buckets for width, buckets in WINDOWS.values())
+        self._updates = [0] * shards
+
+    @staticmethod
+    def keys(transaction: Dict[str, Any]) -> Dict[str, str]:
+        keys = {}
+        for dimension in ("location", "description"):
+            value = normalize_text(transaction.get(dimension)).lower()
+            if value:
+                keys[dimension] = value
+        for field in ACCOUNT_FIELDS:
+            value = normalize_text(transaction.get(field))
+            if value:
+                keys["account"] = value
+                break
+        return keys
+
+    def _shard(self, key: str) -> Tuple[int, _Shard]:
+        index = zlib.crc32(key.encode("utf-8")) % len(self._shards)
+        return index, self._shards[index]
+
+    def record(self, transaction: Dict[str, Any], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        amount, _ = parse_amount(transaction.get("amount"))
+        amount = amount if amount is not None else 0.0
+        for dimension, value in self.keys(transaction).items():
+            key = f"{dimension}:{value}"
+            index, shard = self._shard(key)
+            with shard.lock:
+                counters = shard.entries.get(key)
+                if counters is None:
+                    counters = shard.entries[key] = [RingCounter(width, buckets) for width, buckets in WINDOWS.values()]
+                for counter in counters:
+                    counter.add(now, amount)
+                shard.last_seen[key] = now
+                self._updates[index] += 1
+                if self._updates[index] % self.prune_every == 0:
+                    self._prune(shard, now)
+
+    def record_many(self, transactions: Iterable[Dict[str, Any]], now: Optional[float] = None):
+        for transaction in transactions:
+            self.record(transaction, now)
+
+    def _prune(self, shard: _Shard, now: float):
+        idle = [key for key, seen in shard.last_seen.items() if now - seen > self._horizon]
+        for key in idle:
+            del shard.entries[key]
+            del shard.last_seen[key]
+
+    def features(self, transaction: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Per key dimension and window: ``{"count": n, "sum": total}``."""
+        now = time.time() if now is None else now
+        result = {}
+        for dimension, value in self.keys(transaction).items():
+            key = f"{dimension}:{value}"
+            _, shard = self._shard(key)
+            with shard.lock:
+                counters = shard.entries.get(key)
+                windows = [counter.totals(now) for counter in counters] if counters else None
+            if windows is None:
+                continue
+            result[dimension] = {
+                name: {"count": count, "sum": round(total, 2)}
+                for name, (count, total) in zip(WINDOWS, windows)
+            }
+        return result
+
+    def needs_review(self, transaction: Dict[str, Any], now: Optional[float] = None) -> Optional[str]:
+        """The first window whose card/account count (this transaction included) exceeds its limit, or None."""
+        if not self.review_limits:
+            return None
+        windows = self.features(transaction, now).get("account")
+        if windows is None:
+            return None
+        for window, limit in self.review_limits.items():
+            if limit > 0 and windows[window]["count"] > limit:
+                with self._reviews_lock:
+                    self._reviews += 1
+                return window
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": sum(len(shard.entries) for shard in self._shards),
+            "shards": len(self._shards),
+            "reviews": self._reviews
+        }